@@ -0,0 +1,119 @@
+import asyncio
+import logging
+
+logger = logging.getLogger("StealthCopierX")
+
+class Backfiller:
+    """Replay source messages missed while the bot was offline.
+
+    Messages newer than a pair's checkpoint are fetched oldest-first and
+    pushed through the normal dispatcher, so they share the destination's
+    rate limit and ordering with live traffic. A pair's backfill only
+    submits while its destination queue is less than half full, leaving the
+    rest of the queue to live messages, and at most `concurrency` pairs
+    backfill at once. Gaps are fetched `max_messages` at a time until they
+    are closed; an explicit `limit` is capped at `max_messages`.
+    """
+
+    def __init__(self, client, dispatcher, message_store, copy_message, copy_album=None,
+                 concurrency=4, max_messages=1000):
+        self.client = client
+        self.dispatcher = dispatcher
+        self.message_store = message_store
+        self.copy_message = copy_message
+        self.copy_album = copy_album  # None copies album items one by one
+        self.max_messages = max_messages
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._running = set()  # (user_id, pair_name) currently backfilling
+
+    async def backfill_pairs(self, pairs):
+        """Backfill every (user_id, pair_name, pair_config) from its checkpoint, concurrently."""
+        results = await asyncio.gather(
+            *(self.backfill_pair(user_id, pair_name, pair_config) for user_id, pair_name, pair_config in pairs),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Backfill failed: %s", result)
+        return sum(r for r in results if isinstance(r, int))
+
+    async def backfill_pair(self, user_id, pair_name, pair_config, limit=None):
+        """Copy messages newer than the pair's checkpoint, or the last `limit` messages (at most max_messages).
+
+        Returns the number of messages queued. Messages that are already
+        mapped are skipped, so overlapping runs do not duplicate posts.
+        """
+        key = (user_id, pair_name)
+        if key in self._running:
+            return 0
+        if limit is None:
+            min_id = self.message_store.get_checkpoint(user_id, pair_name)
+            if min_id is None:
+                return 0  # never ran, so there is no gap to fill
+        elif limit > self.max_messages:
+            logger.warning("Backfill of pair '%s' limited to the last %d messages (asked for %d)",
+                           pair_name, self.max_messages, limit)
+
+        self._running.add(key)
+        try:
+            async with self._semaphore:
+                if limit is not None:
+                    messages = [m async for m in self.client.iter_messages(
+                        pair_config['source'], limit=self.effective_limit(limit))]
+                    messages.sort(key=lambda m: m.id)
+                    queued = await self._submit_new(user_id, pair_name, pair_config, group_albums(messages))
+                else:
+                    queued = 0
+                    while True:
+                        # Oldest first from the checkpoint; iter_messages requests the API's maximum page size.
+                        messages = [m async for m in self.client.iter_messages(
+                            pair_config['source'], min_id=min_id, reverse=True, limit=self.max_messages)]
+                        groups = group_albums(messages)
+                        closed = len(messages) < self.max_messages
+                        if not closed and len(groups) > 1:
+                            groups.pop()  # may be an album cut off by the page; fetched again with the next one
+                        queued += await self._submit_new(user_id, pair_name, pair_config, groups)
+                        if closed:
+                            break
+                        min_id = groups[-1][-1].id
+            if queued:
+                logger.info("Backfill queued %d messages for pair '%s'", queued, pair_name)
+            return queued
+        finally:
+            self._running.discard(key)
+
+    def effective_limit(self, limit):
+        """How many of the last `limit` messages a backfill with an explicit limit copies."""
+        return min(limit, self.max_messages)
+
+    async def _submit_new(self, user_id, pair_name, pair_config, groups):
+        """Submit the groups that are not mapped yet and return how many messages were queued."""
+        queued = 0
+        for group in groups:
+            if all(self.message_store.get(user_id, pair_name, m.id) for m in group):
+                continue
+            await self._submit(user_id, pair_name, pair_config, group)
+            queued += len(group)
+        return queued
+
+    async def _submit(self, user_id, pair_name, pair_config, group):
+        dest_channel = pair_config['destination']
+        # Leave at least half of the destination queue to live traffic.
+        while self.dispatcher.depth(dest_channel) >= self.dispatcher.max_queue_size // 2:
+            await asyncio.sleep(0.5)
+        if len(group) > 1 and self.copy_album is not None:
+            await self.dispatcher.submit(dest_channel, self.copy_album, group, dest_channel, pair_config, user_id, pair_name)
+            return
+        for message in group:
+            await self.dispatcher.submit(dest_channel, self.copy_message, message, dest_channel, pair_config, user_id, pair_name)
+
+def group_albums(messages):
+    """Split id-ordered messages into lists, keeping consecutive items of one album together."""
+    groups = []
+    for message in messages:
+        grouped_id = getattr(message, 'grouped_id', None)
+        if grouped_id and groups and getattr(groups[-1][0], 'grouped_id', None) == grouped_id:
+            groups[-1].append(message)
+        else:
+            groups.append([message])
+    return groups
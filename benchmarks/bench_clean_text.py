@@ -0,0 +1,64 @@
+"""Microbenchmark: utils.clean_text vs a precompiled utils.TextCleaner.
+
+Usage: python benchmarks/bench_clean_text.py [--pairs N] [--patterns N] [--messages N]
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+
+def random_word(rng, length=8):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+def make_config(rng, patterns):
+    return {
+        'header_patterns': [rf'^{random_word(rng)}\s*\d+' for _ in range(patterns)],
+        'footer_patterns': [rf'.*{random_word(rng)}$' for _ in range(patterns)],
+        # Separators, self-overlapping phrases and a phrase that prefixes another check overlapping matches
+        'remove_phrases': [random_word(rng) for _ in range(patterns)] + ['--', '==', 'xyzxyz', 'Join now', 'Join'] +
+                          [rf'#{random_word(rng)}\w*' for _ in range(patterns)],
+        'remove_mentions': True,
+    }
+
+def make_message(rng, config):
+    lines = [' '.join(random_word(rng, rng.randint(2, 10)) for _ in range(12)) for _ in range(8)]
+    lines.insert(3, f"join @{random_word(rng)} and {rng.choice(config['remove_phrases'][:len(config['remove_phrases']) // 2])}")
+    lines.insert(rng.randint(0, len(lines)), f"{'-' * rng.randint(1, 7)} {'=' * rng.randint(1, 7)} {'xyz' * rng.randint(1, 5)} Join now!")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pairs', type=int, default=200)
+    parser.add_argument('--patterns', type=int, default=20, help="patterns of each kind per pair")
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    configs = [make_config(rng, args.patterns) for _ in range(args.pairs)]
+    cleaners = [utils.TextCleaner(config) for config in configs]
+    work = []
+    for _ in range(args.messages):
+        i = rng.randrange(args.pairs)
+        work.append((i, make_message(rng, configs[i])))
+
+    start = time.perf_counter()
+    expected = [utils.clean_text(text, configs[i]) for i, text in work]
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [cleaners[i].clean(text) for i, text in work]
+    compiled = time.perf_counter() - start
+
+    mismatches = sum(a != b for a, b in zip(expected, actual))
+    print(f"pairs={args.pairs} patterns/kind={args.patterns} messages={args.messages}")
+    print(f"clean_text:       {baseline / args.messages * 1e6:8.1f} us/message")
+    print(f"TextCleaner.clean:{compiled / args.messages * 1e6:8.1f} us/message")
+    print(f"speedup:          {baseline / compiled:8.1f}x  (output mismatches: {mismatches})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark phash_index.HashIndex against a linear scan at 10k/100k/1M hashes.
+
+Usage: python benchmarks/bench_phash_index.py [--sizes 10000,100000,1000000] [--queries N] [--distance K]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from phash_index import HashIndex
+
+def perturb(rng, h, bits):
+    for bit in rng.sample(range(64), bits):
+        h ^= 1 << bit
+    return h
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default="10000,100000,1000000")
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--distance', type=int, default=6)
+    parser.add_argument('--chunks', type=int, default=4)
+    parser.add_argument('--scan-limit', type=int, default=100000, help="skip the linear scan above this size")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    for size in (int(s) for s in args.sizes.split(',')):
+        hashes = [rng.getrandbits(64) for _ in range(size)]
+        # Half the queries are near-duplicates of stored hashes, half are random.
+        queries = [perturb(rng, rng.choice(hashes), rng.randint(0, args.distance)) for _ in range(args.queries // 2)]
+        queries += [rng.getrandbits(64) for _ in range(args.queries - len(queries))]
+
+        start = time.perf_counter()
+        index = HashIndex(hashes, chunks=args.chunks)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(index.contains(q, args.distance) for q in queries)
+        lookup = (time.perf_counter() - start) / len(queries)
+
+        line = (f"n={size:>8}  build {build:6.2f}s  index {lookup * 1e6:9.1f} us/query  "
+                f"hits {hits}/{len(queries)}  array {index._hashes.itemsize * len(index._hashes) / 1e6:.1f} MB")
+        if size <= args.scan_limit:
+            sample = queries[:100]
+            start = time.perf_counter()
+            scan_hits = sum(any((q ^ h).bit_count() <= args.distance for h in hashes) for q in sample)
+            scan = (time.perf_counter() - start) / len(sample)
+            assert scan_hits == sum(index.contains(q, args.distance) for q in sample)
+            line += f"  linear scan {scan * 1e6:9.1f} us/query ({scan / lookup:.0f}x slower)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
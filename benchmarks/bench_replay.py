@@ -0,0 +1,187 @@
+"""Replay a message stream through bot.handle_new_message -> copy_message offline.
+
+Telegram is replaced by benchmarks.fake_client.FakeClient, which simulates
+send latency and flood waits. The stream is synthetic (configurable sources,
+pairs, edit/reply/media ratios) or loaded from a JSONL recording with one
+object per line: {"chat_id", "id", "text", "reply_to", "media", "edit"}.
+
+Reports messages/sec, p50/p99 end-to-end latency and memory growth.
+Usage: python benchmarks/bench_replay.py [--messages N] [--sources N] [--pairs N] ...
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def synthetic_stream(args, rng):
+    """Yield (kind, chat_id, id, text, reply_to, media) tuples."""
+    sent = {source: [] for source in range(args.sources)}
+    next_id = {source: 0 for source in range(args.sources)}
+    words = ["promo", "news", "update", "@channel", "t.me/join", "#ad", "hello", "price", "today", "link"]
+    for _ in range(args.messages):
+        source = rng.randrange(args.sources)
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+        if sent[source] and rng.random() < args.edit_ratio:
+            yield 'edit', source, rng.choice(sent[source][-50:]), text + " (edited)", None, False
+            continue
+        next_id[source] += 1
+        msg_id = next_id[source]
+        reply_to = rng.choice(sent[source][-50:]) if sent[source] and rng.random() < args.reply_ratio else None
+        sent[source].append(msg_id)
+        yield 'new', source, msg_id, text, reply_to, rng.random() < args.media_ratio
+
+def recorded_stream(path):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                yield ('edit' if item.get('edit') else 'new', item['chat_id'], item['id'], item.get('text', ""),
+                       item.get('reply_to'), bool(item.get('media')))
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def run(args):
+    import bot
+    from fake_client import FakeClient, FakeMessage, fake_photo
+    from session_pool import SessionPool
+
+    rng = random.Random(args.seed)
+    fake = FakeClient(args.latency, args.jitter, args.flood_rate, args.flood_seconds, args.seed)
+    bot.client = bot.backfiller.client = fake
+    senders = [fake] + [
+        FakeClient(args.latency, args.jitter, args.flood_rate, args.flood_seconds, args.seed + i)
+        for i in range(1, args.senders)
+    ]
+    bot.session_pool = SessionPool([(f"sender{i}", sender) for i, sender in enumerate(senders)])
+    bot.is_connected = True
+    bot.NOTIFY_CHAT_ID = 0
+    bot.rate_limiter.rate = bot.rate_limiter.global_bucket.rate = args.rate_limit
+    bot.rate_limiter.burst = bot.rate_limiter.global_bucket.capacity = max(1, int(args.rate_limit))
+    bot.dispatcher.workers = args.workers
+    bot.EDIT_DEBOUNCE = args.edit_debounce
+
+    source_ids = [-1000000000000 - i for i in range(args.sources)]
+    user_id = "1"
+    bot.channel_mappings[user_id] = {}
+    bot.pair_stats[user_id] = {}
+    for i in range(args.pairs):
+        pair_name = f"pair{i}"
+        bot.channel_mappings[user_id][pair_name] = {
+            'source': source_ids[i % args.sources],
+            'destination': -2000000000000 - i,
+            'paused': False,
+            'copy_images': True,
+            'header_patterns': [r'^news\b'],
+            'footer_patterns': [r'.*today$'],
+            'remove_phrases': ['promo', r'#\w+'],
+            'remove_mentions': i % 2 == 0,
+        }
+        bot.pair_stats[user_id][pair_name] = bot.new_pair_stats()
+    bot.rebuild_routes()
+
+    latencies = []
+    observe_end_to_end = bot.observe_end_to_end
+
+    def record_latency(source_msg):
+        latencies.append(time.perf_counter() - source_msg.received_at)
+        observe_end_to_end(source_msg)
+
+    bot.observe_end_to_end = record_latency
+    bot.dispatcher.start()
+
+    stream = recorded_stream(args.record) if args.record else synthetic_stream(args, rng)
+    tracemalloc.start()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    interval = 1 / args.input_rate if args.input_rate else 0
+    events = 0
+    edit_tasks = set()  # Telethon runs each update in its own task, and edits wait out the debounce
+    start = time.perf_counter()
+    for kind, source, msg_id, text, reply_to, media in stream:
+        chat_id = source_ids[source] if not args.record else source
+        event = FakeMessage(chat_id, msg_id, text, fake_photo() if media else None, reply_to)
+        if kind == 'edit':
+            event.edit_date = datetime.now(timezone.utc)
+            task = asyncio.create_task(bot.handle_edited_message(event))
+            edit_tasks.add(task)
+            task.add_done_callback(edit_tasks.discard)
+        else:
+            await bot.handle_new_message(event)
+        events += 1
+        if interval:
+            await asyncio.sleep(interval)
+    await asyncio.gather(*edit_tasks)
+    await bot.dispatcher.join()
+    elapsed = time.perf_counter() - start
+    if args.drain:
+        # Let delayed work (e.g. debounced edits) finish before reading counters.
+        await asyncio.sleep(args.drain)
+        await bot.dispatcher.join()
+    current_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    await bot.dispatcher.stop()
+    bot.message_store.close()
+
+    calls = {method: sum(sender.calls[method] for sender in senders) for method in fake.calls}
+    deliveries = sum(calls.values())
+    print(f"events={events} pairs={args.pairs} sources={args.sources} workers={args.workers} "
+          f"senders={args.senders} latency={args.latency * 1000:.0f}ms flood_rate={args.flood_rate}")
+    print(f"throughput:   {events / elapsed:10.1f} events/s  {deliveries / elapsed:10.1f} API calls/s")
+    print(f"end-to-end:   p50 {percentile(latencies, 0.5) * 1000:8.1f} ms   p99 {percentile(latencies, 0.99) * 1000:8.1f} ms"
+          f"   (n={len(latencies)}, mean {statistics.fmean(latencies) * 1000 if latencies else 0:.1f} ms)")
+    print(f"api calls:    {calls}  flood waits: {sum(sender.flood_waits for sender in senders)}")
+    if args.senders > 1:
+        print("sessions:     " + "  ".join(
+            f"{name} {share:.0%}" for name, (share, _) in bot.session_pool.utilisation().items()))
+    print(f"edits:        {sum(s['edited'] for s in bot.pair_stats[user_id].values())} sent, "
+          f"{sum(s['edits_suppressed'] for s in bot.pair_stats[user_id].values())} suppressed")
+    print(f"memory:       +{(current_memory - baseline_memory) / 1e6:.1f} MB traced "
+          f"(peak {peak_memory / 1e6:.1f} MB), max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--sources', type=int, default=20)
+    parser.add_argument('--pairs', type=int, default=100)
+    parser.add_argument('--edit-ratio', type=float, default=0.1)
+    parser.add_argument('--reply-ratio', type=float, default=0.2)
+    parser.add_argument('--media-ratio', type=float, default=0.2)
+    parser.add_argument('--record', help="replay a JSONL recording instead of a synthetic stream")
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--senders', type=int, default=1, help="fake sender sessions in the session pool")
+    parser.add_argument('--latency', type=float, default=0.02, help="simulated API latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--flood-rate', type=float, default=0.0, help="probability that a call raises FloodWaitError")
+    parser.add_argument('--flood-seconds', type=int, default=1)
+    parser.add_argument('--rate-limit', type=float, default=1e6, help="per-destination and global sends/s")
+    parser.add_argument('--input-rate', type=float, default=0, help="events/s to inject (0 = as fast as possible)")
+    parser.add_argument('--edit-debounce', type=float, default=0.05, help="bot.EDIT_DEBOUNCE for the run")
+    parser.add_argument('--drain', type=float, default=0, help="untimed seconds to wait for delayed work at the end")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # bot.py reads its configuration at import and writes its session,
+    # database and log files to the working directory.
+    os.environ.setdefault('OWNER_ID', '1')
+    os.environ.setdefault('MESSAGE_LOG_LEVEL', 'DEBUG')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.chdir(tempfile.mkdtemp(prefix="stealthcopierx-bench-"))
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
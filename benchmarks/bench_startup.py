@@ -0,0 +1,58 @@
+"""Startup time and peak RSS for text-only vs image-enabled configurations.
+
+Each configuration runs in a fresh interpreter so import costs are measured cold.
+Usage: python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{setup}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+CONFIGS = {
+    "text-only": (
+        "import utils\n"
+        "utils.TextCleaner({'remove_phrases': ['promo'], 'remove_mentions': True}).clean('promo @someone hi')"
+    ),
+    "image-enabled": (
+        "import utils, imageutils\n"
+        "utils.TextCleaner({'remove_phrases': ['promo'], 'remove_mentions': True}).clean('promo @someone hi')\n"
+        "imageutils.warm_up()"
+    ),
+}
+
+def measure(setup):
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(setup=setup)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, setup in CONFIGS.items():
+        try:
+            results = [measure(setup) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"{name:14s} failed: {e.stderr.strip().splitlines()[-1]}")
+            continue
+        seconds = statistics.median(r["seconds"] for r in results)
+        rss = max(r["max_rss_kb"] for r in results)
+        print(f"{name:14s} import+first use {seconds * 1000:8.1f} ms   peak RSS {rss / 1024:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Offline stand-in for telethon.TelegramClient used by the replay benchmark."""
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from telethon import errors
+from telethon.tl.types import MessageMediaPhoto
+
+class FakeMessage:
+    """The subset of telethon's Message that the copy pipeline reads."""
+
+    def __init__(self, chat_id, id, text="", media=None, reply_to_msg_id=None, grouped_id=None, edit_date=None):
+        self.chat_id = chat_id
+        self.id = id
+        self.text = text
+        self.message = text
+        self.media = media
+        self.reply_to_msg_id = reply_to_msg_id
+        self.grouped_id = grouped_id
+        self.date = datetime.now(timezone.utc)
+        self.edit_date = edit_date
+
+def fake_photo():
+    return MessageMediaPhoto(photo=None)
+
+class FakeClient:
+    """Simulates send latency and flood waits instead of talking to Telegram.
+
+    Each API call sleeps for `latency` +/- `jitter` seconds. With probability
+    `flood_rate` a send raises FloodWaitError asking for `flood_seconds`.
+    Method signatures follow Telethon 1.36 without catch-all keyword
+    arguments, so misuse of the real API fails here too.
+    """
+
+    def __init__(self, latency=0.02, jitter=0.01, flood_rate=0.0, flood_seconds=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.rng = random.Random(seed)
+        self.history = {}  # {chat_id: [FakeMessage]} for iter_messages
+        self.next_id = {}  # {dest: last message id}
+        self.calls = {'send_message': 0, 'send_file': 0, 'edit_message': 0, 'delete_messages': 0}
+        self.flood_waits = 0
+
+    async def _api_call(self, method):
+        self.calls[method] += 1
+        await asyncio.sleep(max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter)))
+        if self.flood_rate and self.rng.random() < self.flood_rate:
+            self.flood_waits += 1
+            raise errors.FloodWaitError(request=None, capture=self.flood_seconds)
+
+    def _new_message(self, dest, text="", media=None):
+        self.next_id[dest] = self.next_id.get(dest, 0) + 1
+        return FakeMessage(dest, self.next_id[dest], text, media)
+
+    async def send_message(self, entity, message="", *, reply_to=None, attributes=None, parse_mode=(),
+                           formatting_entities=None, link_preview=True, file=None, thumb=None,
+                           force_document=False, clear_draft=False, buttons=None, silent=None, background=None,
+                           supports_streaming=False, schedule=None, comment_to=None, nosound_video=None,
+                           send_as=None, message_effect_id=None):
+        await self._api_call('send_message')
+        return self._new_message(entity, message, file)
+
+    async def send_file(self, entity, file, *, caption=None, force_document=False, file_size=None,
+                        clear_draft=False, progress_callback=None, reply_to=None, attributes=None, thumb=None,
+                        allow_cache=True, parse_mode=(), formatting_entities=None, voice_note=False,
+                        video_note=False, buttons=None, silent=None, background=None, supports_streaming=False,
+                        schedule=None, comment_to=None, ttl=None, nosound_video=None, send_as=None,
+                        message_effect_id=None):
+        await self._api_call('send_file')
+        files = file if isinstance(file, (list, tuple)) else [file]
+        captions = caption if isinstance(caption, (list, tuple)) else [caption] * len(files)
+        sent = [self._new_message(entity, text or "", f) for f, text in zip(files, captions)]
+        return sent if isinstance(file, (list, tuple)) else sent[0]
+
+    async def edit_message(self, entity, message=None, text=None, *, parse_mode=(), attributes=None,
+                           formatting_entities=None, link_preview=True, file=None, thumb=None,
+                           force_document=False, buttons=None, supports_streaming=False, schedule=None):
+        await self._api_call('edit_message')
+        return self._new_message(entity, text or "")
+
+    async def delete_messages(self, entity, message_ids, *, revoke=True):
+        await self._api_call('delete_messages')
+
+    async def download_media(self, message, file=None, *, thumb=None, progress_callback=None):
+        await asyncio.sleep(self.latency)
+        return b"\xff\xd8" + bytes(self.rng.getrandbits(8) for _ in range(2048))
+
+    async def iter_messages(self, entity, limit=None, *, offset_date=None, offset_id=0, max_id=0, min_id=0,
+                            add_offset=0, search=None, filter=None, from_user=None, wait_time=None, ids=None,
+                            reverse=False, reply_to=None, scheduled=False):
+        for message in self._history(entity, limit, min_id, ids, reverse):
+            yield message
+
+    async def get_messages(self, entity, limit=None, *, offset_date=None, offset_id=0, max_id=0, min_id=0,
+                           add_offset=0, search=None, filter=None, from_user=None, wait_time=None, ids=None,
+                           reverse=False, reply_to=None, scheduled=False):
+        return self._history(entity, limit, min_id, ids, reverse)
+
+    def _history(self, entity, limit, min_id, ids, reverse):
+        history = self.history.get(entity, [])
+        if ids is not None:
+            by_id = {m.id: m for m in history}
+            return [by_id.get(msg_id) for msg_id in ids]
+        messages = [m for m in history if m.id > (min_id or 0)]
+        if not reverse:
+            messages.reverse()
+        return messages[:limit]
+
+    async def get_me(self):
+        return FakeMessage(0, 0)
+
+    def is_connected(self):
+        return True
@@ -1,13 +1,29 @@
 import asyncio
+import hashlib
 import logging
 import json
 import random
 import os
+import signal
+import time
 from dotenv import load_dotenv
-from telethon import TelegramClient, events
-from telethon.tl.types import MessageMediaPhoto
+from telethon import TelegramClient, errors, events
+from telethon.sessions import StringSession
+from telethon.tl.types import MessageMediaPhoto, PeerChannel
+from telethon.utils import resolve_id
 from datetime import datetime
 import utils
+import image_pool
+from dispatcher import Dispatcher
+from message_store import MessageStore
+from ratelimit import RateLimiter
+from media import MediaBuffer, as_upload, media_id
+from cache import ContentCache
+from phash_index import RecentHashes
+from metrics import Metrics
+from backfill import Backfiller
+from session_pool import SessionPool
+from inactivity import InactivityMonitor
 
 # Load environment variables
 load_dotenv()
@@ -18,17 +34,43 @@ API_ID = 23617139  # Replace with your API ID
 API_HASH = "5bfc582b080fa09a1a2eaa6ee60fd5d4"  # Replace with your API hash
 SESSION_FILE = "userbot_session"
 client = TelegramClient(SESSION_FILE, API_ID, API_HASH)
+# Comma-separated session files of extra accounts that do all sending; empty sends from SESSION_FILE.
+SENDER_SESSIONS = [name.strip() for name in os.getenv('SENDER_SESSIONS', '').split(',') if name.strip()]
 
 MAPPINGS_FILE = "channel_mappings.json"
+SAVE_DEBOUNCE = 2  # seconds to coalesce mapping changes before writing
+MESSAGE_DB_FILE = "message_map.db"
+MESSAGE_RETENTION = int(os.getenv('MESSAGE_RETENTION_DAYS', 30)) * 86400  # seconds
 MAX_RETRIES = 3
 RETRY_DELAY = 5  # seconds
-MAX_QUEUE_SIZE = 100
+DELETE_BATCH_SIZE = 100  # message ids per delete_messages request (API maximum)
+ALBUM_MODE = os.getenv('ALBUM_MODE', 'true').lower() == 'true'  # copy media groups as one grouped send
+EDIT_DEBOUNCE = float(os.getenv('EDIT_DEBOUNCE', 3))  # quiet seconds before an edit is forwarded; 0 disables
+EDIT_DEBOUNCE_MAX = float(os.getenv('EDIT_DEBOUNCE_MAX', 15))  # longest an edit burst is held back
+MAX_QUEUE_SIZE = 100  # pending jobs per destination before backpressure
+WORKER_COUNT = int(os.getenv('WORKER_COUNT', 8))
+DEST_RATE = float(os.getenv('DEST_RATE', 1))  # sends per second per destination
+DEST_BURST = int(os.getenv('DEST_BURST', 3))
+GLOBAL_RATE = float(os.getenv('GLOBAL_RATE', 20))  # sends per second across all destinations
+DEDUP_WINDOW = int(os.getenv('DEDUP_WINDOW', 1000))  # recent images remembered per pair
+DEDUP_DISTANCE = int(os.getenv('DEDUP_DISTANCE', 6))  # max pHash bit difference for a duplicate
+CONTENT_CACHE_SIZE = int(os.getenv('CONTENT_CACHE_SIZE', 4096))  # cleaned texts and image hashes
+MEDIA_CACHE_SIZE = int(os.getenv('MEDIA_CACHE_SIZE', 64))  # processed image blobs
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))  # image processes; 0 processes images inline
+IMAGE_JOB_TIMEOUT = float(os.getenv('IMAGE_JOB_TIMEOUT', 30))  # seconds
+BACKFILL_CONCURRENCY = int(os.getenv('BACKFILL_CONCURRENCY', 4))  # pairs backfilling at once
+BACKFILL_MAX_MESSAGES = int(os.getenv('BACKFILL_MAX_MESSAGES', 1000))  # gap backfill page size, /backfill cap
+CONNECTION_CHECK_INTERVAL = 30  # seconds
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))  # local Prometheus endpoint; 0 disables it
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+MESSAGE_LOG_LEVEL = logging.getLevelName(os.getenv('MESSAGE_LOG_LEVEL', 'INFO').upper())  # per-message log lines
 NOTIFY_CHAT_ID = None
 INACTIVITY_THRESHOLD = 172800  # 48 hours in seconds
+INACTIVITY_DIGEST_INTERVAL = 3600  # at most one inactivity notification per interval (seconds)
 
 # Logging setup
 logging.basicConfig(
-    level=logging.INFO,
+    level=LOG_LEVEL,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[logging.FileHandler("stealthcopierx.log"), logging.StreamHandler()]
 )
@@ -36,19 +78,142 @@ logger = logging.getLogger("StealthCopierX")
 
 # Data structures
 channel_mappings = {}
-message_id_mapping = {}  # {user_id: {pair_name: {source_msg_id: dest_msg_id}}}
+message_store = MessageStore(MESSAGE_DB_FILE, retention=MESSAGE_RETENTION)  # (user_id, pair_name, source_msg_id) -> dest_msg_id
+pair_cleaners = {}  # {(user_id, pair_name): utils.TextCleaner}
+source_routes = {}  # {source_chat_id: [(user_id, pair_name, pair_config), ...]} (active pairs only)
 is_connected = False
+mappings_dirty = False
+save_task = None
+mappings_lock = asyncio.Lock()  # one writer of the mappings temp file at a time
 pair_stats = {}
+pending_edits = {}  # {(chat_id, msg_id): newest edit event still being debounced, None once deleted}
+media_buffer = MediaBuffer()
+content_cache = ContentCache(CONTENT_CACHE_SIZE)  # derived per-message results shared across pairs
+media_cache = ContentCache(MEDIA_CACHE_SIZE)
+recent_images = {}  # {(user_id, pair_name): RecentHashes}
+# Senders raise flood waits instead of sleeping in Telethon; they are handled by rate_limiter.
+if SENDER_SESSIONS:
+    session_pool = SessionPool(
+        [(name, TelegramClient(name, API_ID, API_HASH, flood_sleep_threshold=0)) for name in SENDER_SESSIONS]
+    )
+else:
+    session_pool = SessionPool([(SESSION_FILE, None)])  # connected in main() once the session is authorised
+# GLOBAL_RATE is one account's budget, so it scales with the number of senders.
+sender_rate = GLOBAL_RATE * len(session_pool.clients)
+rate_limiter = RateLimiter(DEST_RATE, DEST_BURST, sender_rate, max(1, int(sender_rate)))
+metrics = Metrics()
+dispatcher = Dispatcher(WORKER_COUNT, MAX_QUEUE_SIZE, throttle=rate_limiter.paused_for, metrics=metrics)
+metrics.gauge('queue_depth', lambda: {(('destination', dest),): depth for dest, depth in dispatcher.depths().items()})
+metrics.gauge('destination_rate', lambda: {(('destination', dest),): rate for dest, rate in rate_limiter.rates().items()})
+metrics.gauge('session_call_share', lambda: {(('session', name),): share for name, (share, _) in session_pool.utilisation().items()})
+metrics.gauge('session_busy', lambda: {(('session', name),): busy for name, (_, busy) in session_pool.utilisation().items()})
 
 # Helper Functions
 def save_mappings():
-    """Save channel mappings to a JSON file."""
+    """Mark channel mappings as changed; they are written in the background shortly after."""
+    global mappings_dirty, save_task
+    mappings_dirty = True
+    if save_task is None or save_task.done():
+        save_task = asyncio.create_task(flush_mappings_later())
+
+async def flush_mappings_later():
+    """Coalesce changes made within SAVE_DEBOUNCE seconds into one write."""
+    while mappings_dirty:
+        await asyncio.sleep(SAVE_DEBOUNCE)
+        await flush_mappings_async()
+
+async def flush_mappings_async():
+    """Write channel mappings from a worker thread if they changed."""
+    global mappings_dirty
+    async with mappings_lock:
+        if not mappings_dirty:
+            return
+        mappings_dirty = False
+        data = json.dumps(channel_mappings)
+        try:
+            await asyncio.to_thread(write_mappings_file, data)
+        except Exception as e:
+            mappings_dirty = True
+            logger.error("Error saving mappings: %s", e)
+
+def flush_mappings():
+    """Write channel mappings synchronously if they changed (used on shutdown).
+
+    Callers on the event loop hold mappings_lock, so a background write of
+    the same temp file is finished first.
+    """
+    global mappings_dirty
+    if not mappings_dirty:
+        return
     try:
-        with open(MAPPINGS_FILE, "w") as f:
-            json.dump(channel_mappings, f)
-        logger.info("Channel mappings saved.")
+        write_mappings_file(json.dumps(channel_mappings))
+        mappings_dirty = False
     except Exception as e:
-        logger.error(f"Error saving mappings: {e}")
+        logger.error("Error saving mappings: %s", e)
+
+def write_mappings_file(data):
+    """Atomically replace the mappings file with data."""
+    tmp_file = MAPPINGS_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, MAPPINGS_FILE)
+    logger.info("Channel mappings saved.")
+
+def rebuild_routes():
+    """Rebuild the source chat routing index from channel mappings."""
+    source_routes.clear()
+    for user_id, pairs in channel_mappings.items():
+        for pair_name, pair_config in pairs.items():
+            add_route(user_id, pair_name, pair_config)
+
+def add_route(user_id, pair_name, pair_config):
+    """Route messages from the pair's source chat to it, unless the pair is paused."""
+    remove_route(user_id, pair_name)
+    if pair_config.get('paused', False):
+        return
+    source_routes.setdefault(int(pair_config['source']), []).append((user_id, pair_name, pair_config))
+
+def remove_route(user_id, pair_name):
+    """Drop a pair from the routing index."""
+    for source_chat_id, routes in list(source_routes.items()):
+        routes[:] = [r for r in routes if r[0] != user_id or r[1] != pair_name]
+        if not routes:
+            del source_routes[source_chat_id]
+
+def refresh_cleaner(user_id, pair_name):
+    """Recompile a pair's text filters after they change."""
+    pair_cleaners[(user_id, pair_name)] = utils.TextCleaner(channel_mappings[user_id][pair_name])
+
+def get_cleaner(user_id, pair_name, pair_config):
+    """Return the compiled text filters for a pair."""
+    cleaner = pair_cleaners.get((user_id, pair_name))
+    if cleaner is None:
+        cleaner = pair_cleaners[(user_id, pair_name)] = utils.TextCleaner(pair_config)
+    return cleaner
+
+def new_pair_stats():
+    """Fresh counters for a pair."""
+    return {
+        'copied': 0, 'edited': 0, 'last_activity': None,
+        'media_passthrough': 0, 'bytes_downloaded': 0, 'bytes_uploaded': 0,
+        'duplicates_skipped': 0, 'edits_suppressed': 0, 'deleted': 0
+    }
+
+def clean_message_text(source_msg, user_id, pair_name, pair_config):
+    """Cleaned text of a message, computed once per distinct filter configuration."""
+    cleaner = get_cleaner(user_id, pair_name, pair_config)
+    key = ('text', source_msg.chat_id, source_msg.id, source_msg.edit_date, cleaner.fingerprint)
+    return content_cache.get_or_create(key, lambda: cleaner.clean(source_msg.text or source_msg.message or ""))
+
+def text_digest(text):
+    """Short digest of a cleaned text, stored per mapping to detect no-op edits."""
+    return hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+def record_suppressed_edit(user_id, pair_name):
+    pair_stats[user_id][pair_name]['edits_suppressed'] += 1
+    metrics.inc('edits_suppressed', pair=pair_name)
 
 def load_mappings():
     """Load channel mappings from a JSON file."""
@@ -56,92 +221,505 @@ def load_mappings():
     try:
         with open(MAPPINGS_FILE, "r") as f:
             channel_mappings = json.load(f)
-        logger.info(f"Loaded {sum(len(v) for v in channel_mappings.values())} mappings.")
+        logger.info("Loaded %d mappings.", sum(len(v) for v in channel_mappings.values()))
         for user_id, pairs in channel_mappings.items():
             if user_id not in pair_stats:
                 pair_stats[user_id] = {}
             for pair_name in pairs:
-                pair_stats[user_id][pair_name] = {
-                    'copied': 0, 'edited': 0, 'last_activity': None
-                }
+                pair_stats[user_id][pair_name] = new_pair_stats()
+                refresh_cleaner(user_id, pair_name)
+        rebuild_routes()
     except FileNotFoundError:
         logger.info("No mappings file found. Starting fresh.")
     except Exception as e:
-        logger.error(f"Error loading mappings: {e}")
+        logger.error("Error loading mappings: %s", e)
+
+async def call_with_retries(dest_channel, pair_name, source_msg_id, request, sender=None):
+    """Run request(client, name) under the destination's rate limit with retry logic. Returns True on success.
+
+    client and name are the session chosen for the destination, failing over
+    while one is in a flood wait. A sender name pins the request to that
+    session instead, as edits and deletes must come from the session that
+    posted the message; unknown names fall back to the destination's home.
+    """
+    if sender is not None and sender not in session_pool.clients:
+        sender = session_pool.home(dest_channel)
+    retry_count = 0
+    while retry_count < MAX_RETRIES:
+        name = sender or session_pool.sender_for(dest_channel)
+        try:
+            await rate_limiter.acquire(dest_channel)
+            with session_pool.using(name) as client_for_send:
+                await request(client_for_send, name)
+            rate_limiter.success(dest_channel)
+            return True
+        except (errors.FloodWaitError, errors.SlowModeWaitError) as e:
+            # Not counted as a retry: move to another session, or wait exactly as long as the server asked.
+            metrics.inc('flood_waits', pair=pair_name)
+            if session_pool.flood_wait(name, e.seconds) and sender is None:
+                logger.warning("Flood wait of %ss for session '%s', sending to %s from another session",
+                               e.seconds, name, dest_channel)
+            else:
+                rate_limiter.flood_wait(dest_channel, e.seconds)
+                logger.warning("Flood wait of %ss for %s", e.seconds, dest_channel)
+        except Exception as e:
+            retry_count += 1
+            if retry_count == MAX_RETRIES:
+                metrics.inc('failures', pair=pair_name)
+                logger.error("Failed to copy/edit message %s after %d retries: %s", source_msg_id, MAX_RETRIES, e)
+                await client.send_message(NOTIFY_CHAT_ID, f"Failed to process message in pair '{pair_name}' after retries: {e}")
+            else:
+                metrics.inc('retries', pair=pair_name)
+                await asyncio.sleep(RETRY_DELAY)
+    return False
+
+def has_image_transform(pair_config):
+    """True if photos for this pair must be modified before sending."""
+    return bool(pair_config.get('watermark_text') or pair_config.get('reencode_images'))
+
+async def prepare_media(source_msg, pair_config, user_id, pair_name):
+    """Return the file to send for a photo message.
+
+    Without image transformations the original media is re-sent by file
+    reference and never downloaded. Otherwise the photo is downloaded once
+    into the shared media buffer, transformed and uploaded. File references
+    belong to the listening account, so separate sender sessions always
+    get an upload.
+    """
+    stats = pair_stats[user_id][pair_name]
+    if not has_image_transform(pair_config) and not SENDER_SESSIONS:
+        stats['media_passthrough'] += 1
+        return source_msg.media
+
+    reencode, watermark = bool(pair_config.get('reencode_images')), pair_config.get('watermark_text')
+
+    async def transform():
+        data, downloaded = await media_buffer.get(client, source_msg)
+        if downloaded:
+            stats['bytes_downloaded'] += len(data)
+        if reencode:
+            data = await image_pool.reencode_image(data)
+        if watermark:
+            data = await image_pool.add_visible_watermark(data, watermark)
+        return data
+
+    # Pairs with the same transformation share one processed copy
+    key = ('media', source_msg.chat_id, source_msg.id, media_id(source_msg.media), reencode, watermark)
+    data = await media_cache.get_or_compute(key, transform)
+    stats['bytes_uploaded'] += len(data)
+    return as_upload(data)
+
+async def image_phash(source_msg, user_id, pair_name):
+    """Perceptual hash of a photo message, computed once and shared across pairs."""
+    async def compute():
+        data, downloaded = await media_buffer.get(client, source_msg)
+        if downloaded:
+            pair_stats[user_id][pair_name]['bytes_downloaded'] += len(data)
+        return await image_pool.phash(data)
+
+    key = ('phash', source_msg.chat_id, source_msg.id, media_id(source_msg.media))
+    return await content_cache.get_or_compute(key, compute)
+
+def recent_images_for(user_id, pair_name):
+    """Recently forwarded image hashes for a pair."""
+    recent = recent_images.get((user_id, pair_name))
+    if recent is None:
+        recent = recent_images[(user_id, pair_name)] = RecentHashes(DEDUP_WINDOW)
+    return recent
+
+def record_activity(user_id, pair_name):
+    now = time.time()
+    pair_stats[user_id][pair_name]['last_activity'] = now
+    inactivity.activity((user_id, pair_name), now)
+
+def mark_received(*msgs):
+    """Stamp messages with their arrival time for end-to-end latency."""
+    received_at = time.perf_counter()
+    for msg in msgs:
+        msg.received_at = received_at
+        # For edits, date is the original post time, not when the update was sent.
+        if msg.date and not msg.edit_date:
+            metrics.observe('receive', max(0.0, time.time() - msg.date.timestamp()))
+    return received_at
+
+def observe_end_to_end(source_msg):
+    received_at = getattr(source_msg, 'received_at', None)
+    if received_at is not None:
+        metrics.observe('end_to_end', time.perf_counter() - received_at)
 
 async def copy_message(source_msg, dest_channel, pair_config, user_id, pair_name):
     """Copy or edit a message from source to destination with retry logic."""
     try:
-        cleaned_text = utils.clean_text(source_msg.text or source_msg.message or "", pair_config)
+        with metrics.timer('clean'):
+            cleaned_text = clean_message_text(source_msg, user_id, pair_name, pair_config)
         if not cleaned_text and not isinstance(source_msg.media, MessageMediaPhoto):
-            logger.info(f"Skipping empty message from {source_msg.chat_id}")
+            logger.log(MESSAGE_LOG_LEVEL, "Skipping empty message from %s", source_msg.chat_id)
+            message_store.set_checkpoint(user_id, pair_name, source_msg.id)
+            return
+        digest = text_digest(cleaned_text)
+        if message_store.get_digest(user_id, pair_name, source_msg.id) == digest:
+            record_suppressed_edit(user_id, pair_name)
+            logger.log(MESSAGE_LOG_LEVEL, "Skipping unchanged edit of %s for pair '%s'", source_msg.id, pair_name)
             return
 
         reply_to = await get_reply_to(source_msg, dest_channel, user_id, pair_name)
-        retry_count = 0
-        while retry_count < MAX_RETRIES:
-            try:
-                if source_msg.id in message_id_mapping[user_id][pair_name]:
-                    await client.edit_message(
-                        dest_channel,
-                        message_id_mapping[user_id][pair_name][source_msg.id],
-                        cleaned_text,
-                        reply_to=reply_to
-                    )
-                    pair_stats[user_id][pair_name]['edited'] += 1
-                    logger.info(f"Edited message {source_msg.id} in {dest_channel}")
-                else:
-                    sent_msg = await client.send_message(
+        file = None
+        image_hash = None
+        if (isinstance(source_msg.media, MessageMediaPhoto) and pair_config.get('copy_images', True)
+                and not message_store.get(user_id, pair_name, source_msg.id)):
+            if pair_config.get('dedup_images'):
+                image_hash = await image_phash(source_msg, user_id, pair_name)
+                if recent_images_for(user_id, pair_name).seen(image_hash, DEDUP_DISTANCE):
+                    pair_stats[user_id][pair_name]['duplicates_skipped'] += 1
+                    logger.log(MESSAGE_LOG_LEVEL, "Skipping duplicate image %s for pair '%s'", source_msg.id, pair_name)
+                    message_store.set_checkpoint(user_id, pair_name, source_msg.id)
+                    return
+            file = await prepare_media(source_msg, pair_config, user_id, pair_name)
+
+        async def request(sender, sender_name):
+            dest_msg_id = message_store.get(user_id, pair_name, source_msg.id)
+            if dest_msg_id:
+                try:
+                    with metrics.timer('send'):
+                        # The reply target of a message cannot be changed by an edit.
+                        await sender.edit_message(dest_channel, dest_msg_id, cleaned_text)
+                except errors.MessageNotModifiedError:
+                    # Mapped before digests were stored; the text was already current.
+                    message_store.set_digest(user_id, pair_name, source_msg.id, digest)
+                    record_suppressed_edit(user_id, pair_name)
+                    return
+                message_store.set_digest(user_id, pair_name, source_msg.id, digest)
+                pair_stats[user_id][pair_name]['edited'] += 1
+                metrics.inc('messages', pair=pair_name, kind='edited')
+                logger.log(MESSAGE_LOG_LEVEL, "Edited message %s in %s", source_msg.id, dest_channel)
+            else:
+                if hasattr(file, 'seek'):
+                    file.seek(0)  # rewind uploads consumed by a failed attempt
+                with metrics.timer('send'):
+                    sent_msg = await sender.send_message(
                         dest_channel,
                         cleaned_text,
                         reply_to=reply_to,
-                        file=source_msg.media if isinstance(source_msg.media, MessageMediaPhoto) and pair_config.get('copy_images', True) else None
+                        file=file
                     )
-                    if user_id not in message_id_mapping:
-                        message_id_mapping[user_id] = {}
-                    if pair_name not in message_id_mapping[user_id]:
-                        message_id_mapping[user_id][pair_name] = {}
-                    message_id_mapping[user_id][pair_name][source_msg.id] = sent_msg.id
-                    pair_stats[user_id][pair_name]['copied'] += 1
-                    logger.info(f"Copied message {source_msg.id} to {dest_channel}")
-                pair_stats[user_id][pair_name]['last_activity'] = datetime.now().timestamp()
-                break
-            except Exception as e:
-                retry_count += 1
-                if retry_count == MAX_RETRIES:
-                    logger.error(f"Failed to copy/edit message {source_msg.id} after {MAX_RETRIES} retries: {e}")
-                    await client.send_message(NOTIFY_CHAT_ID, f"Failed to process message in pair '{pair_name}' after retries: {e}")
-                else:
-                    await asyncio.sleep(RETRY_DELAY)
+                with metrics.timer('map_record'):
+                    message_store.put(user_id, pair_name, source_msg.id, sent_msg.id, digest, sender_name)
+                if image_hash is not None:
+                    recent_images_for(user_id, pair_name).add(image_hash)
+                pair_stats[user_id][pair_name]['copied'] += 1
+                metrics.inc('messages', pair=pair_name, kind='copied')
+                logger.log(MESSAGE_LOG_LEVEL, "Copied message %s to %s", source_msg.id, dest_channel)
+            record_activity(user_id, pair_name)
+
+        # Edits go to the session that posted the copy; mappings from before sessions were recorded use the home one.
+        posted_by = None
+        if message_store.get(user_id, pair_name, source_msg.id):
+            posted_by = message_store.get_sender(user_id, pair_name, source_msg.id) or session_pool.home(dest_channel)
+        if await call_with_retries(dest_channel, pair_name, source_msg.id, request, posted_by):
+            message_store.set_checkpoint(user_id, pair_name, source_msg.id)
+            observe_end_to_end(source_msg)
     except Exception as e:
-        logger.error(f"Error in copy_message: {e}")
+        logger.error("Error in copy_message: %s", e)
+
+async def copy_album(source_msgs, dest_channel, pair_config, user_id, pair_name):
+    """Copy an album (media group) to the destination as a single grouped send."""
+    try:
+        if pair_config.get('copy_images', True):
+            photo_msgs = [m for m in source_msgs if isinstance(m.media, MessageMediaPhoto)]
+        else:
+            photo_msgs = []
+        caption_msg = next((m for m in source_msgs if m.text or m.message), None)
+        if len(photo_msgs) < 2:
+            # Nothing to group; copy the messages one by one as before.
+            for source_msg in source_msgs:
+                await copy_message(source_msg, dest_channel, pair_config, user_id, pair_name)
+            return
+        if message_store.get(user_id, pair_name, photo_msgs[0].id):
+            return  # already copied
+        image_hashes = {}
+        if pair_config.get('dedup_images'):
+            recent = recent_images_for(user_id, pair_name)
+            for m in photo_msgs:
+                image_hashes[m.id] = await image_phash(m, user_id, pair_name)
+            unique_msgs = [m for m in photo_msgs if not recent.seen(image_hashes[m.id], DEDUP_DISTANCE)]
+            pair_stats[user_id][pair_name]['duplicates_skipped'] += len(photo_msgs) - len(unique_msgs)
+            if not unique_msgs:
+                logger.log(MESSAGE_LOG_LEVEL, "Skipping duplicate album %s for pair '%s'", photo_msgs[0].grouped_id, pair_name)
+                message_store.set_checkpoint(user_id, pair_name, max(m.id for m in source_msgs))
+                return
+            photo_msgs = unique_msgs
+
+        captions = [""] * len(photo_msgs)
+        if caption_msg is not None:
+            caption = clean_message_text(caption_msg, user_id, pair_name, pair_config)
+            captions[photo_msgs.index(caption_msg) if caption_msg in photo_msgs else 0] = caption
+        reply_to = await get_reply_to(source_msgs[0], dest_channel, user_id, pair_name)
+        files = [await prepare_media(m, pair_config, user_id, pair_name) for m in photo_msgs]
+
+        async def request(sender, sender_name):
+            for file in files:
+                if hasattr(file, 'seek'):
+                    file.seek(0)  # rewind uploads consumed by a failed attempt
+            with metrics.timer('send'):
+                sent_msgs = await sender.send_file(
+                    dest_channel,
+                    files,
+                    caption=captions,
+                    reply_to=reply_to
+                )
+            with metrics.timer('map_record'):
+                message_store.put_many(user_id, pair_name, [
+                    (source_msg.id, sent_msg.id) for source_msg, sent_msg in zip(photo_msgs, sent_msgs)
+                ], sender_name)
+            for source_msg in photo_msgs:
+                if source_msg.id in image_hashes:
+                    recent_images_for(user_id, pair_name).add(image_hashes[source_msg.id])
+            pair_stats[user_id][pair_name]['copied'] += len(sent_msgs)
+            metrics.inc('messages', len(sent_msgs), pair=pair_name, kind='copied')
+            record_activity(user_id, pair_name)
+            logger.log(MESSAGE_LOG_LEVEL, "Copied album %s (%d items) to %s", photo_msgs[0].grouped_id, len(sent_msgs), dest_channel)
+
+        if await call_with_retries(dest_channel, pair_name, photo_msgs[0].id, request):
+            message_store.set_checkpoint(user_id, pair_name, max(m.id for m in source_msgs))
+            observe_end_to_end(photo_msgs[0])
+    except Exception as e:
+        logger.error("Error in copy_album: %s", e)
 
 async def get_reply_to(source_msg, dest_channel, user_id, pair_name):
     """Get the destination reply-to message ID if it exists."""
-    if source_msg.reply_to_msg_id and user_id in message_id_mapping and pair_name in message_id_mapping[user_id]:
-        return message_id_mapping[user_id][pair_name].get(source_msg.reply_to_msg_id)
+    if source_msg.reply_to_msg_id:
+        return message_store.get(user_id, pair_name, source_msg.reply_to_msg_id)
     return None
 
+backfiller = Backfiller(
+    client, dispatcher, message_store, copy_message, copy_album if ALBUM_MODE else None,
+    concurrency=BACKFILL_CONCURRENCY, max_messages=BACKFILL_MAX_MESSAGES
+)
+
+async def submit_journaled(kind, chat_id, messages, routes):
+    """Journal a copy job per route, then queue the jobs.
+
+    The journal is written synchronously so that handlers queue jobs in the
+    order their updates arrived.
+    """
+    routes = list(routes)
+    msg_ids = [m.id for m in messages]
+    try:
+        job_ids = message_store.add_jobs([(user_id, pair_name, chat_id, msg_ids, kind) for user_id, pair_name, _ in routes])
+    except Exception as e:
+        logger.error("Error journaling message %s: %s", msg_ids[0], e)
+        job_ids = [None] * len(routes)
+    for (user_id, pair_name, pair_config), job_id in zip(routes, job_ids):
+        await submit_job(job_id, kind, messages, pair_config, user_id, pair_name)
+
+async def submit_job(job_id, kind, messages, pair_config, user_id, pair_name):
+    dest_channel = pair_config['destination']
+    if kind == 'album':
+        await dispatcher.submit(dest_channel, run_job, job_id, copy_album, messages, dest_channel, pair_config, user_id, pair_name)
+    else:
+        await dispatcher.submit(dest_channel, run_job, job_id, copy_message, messages[0], dest_channel, pair_config, user_id, pair_name)
+
+async def run_job(job_id, copy, *args):
+    """Run a journaled copy job and mark it finished, unless it was cancelled by a shutdown."""
+    await copy(*args)
+    if job_id is not None:
+        message_store.finish_job(job_id)
+
+async def replay_journal(jobs):
+    """Queue jobs a previous run journaled but did not finish, oldest first.
+
+    Messages are fetched again from their source. New-message jobs whose
+    messages are already mapped were sent before the crash and are dropped;
+    edits are safe to repeat because unchanged edits are skipped.
+    """
+    if not jobs:
+        return
+    wanted = {}  # {chat_id: {msg_id}}
+    for _, _, _, chat_id, msg_ids, _ in jobs:
+        wanted.setdefault(chat_id, set()).update(msg_ids)
+    fetched = {}  # {(chat_id, msg_id): message}
+    for chat_id, msg_ids in wanted.items():
+        msg_ids = sorted(msg_ids)
+        for start in range(0, len(msg_ids), 100):
+            try:
+                messages = await client.get_messages(chat_id, ids=msg_ids[start:start + 100])
+            except Exception as e:
+                logger.error("Error fetching journaled messages from %s: %s", chat_id, e)
+                continue
+            fetched.update(((chat_id, m.id), m) for m in messages if m is not None)
+
+    replayed = 0
+    for job_id, user_id, pair_name, chat_id, msg_ids, kind in jobs:
+        pair_config = channel_mappings.get(user_id, {}).get(pair_name)
+        messages = [fetched[(chat_id, msg_id)] for msg_id in msg_ids if (chat_id, msg_id) in fetched]
+        if (pair_config is None or pair_config['paused'] or not messages or
+                (kind != 'edit' and all(message_store.get(user_id, pair_name, m.id) for m in messages))):
+            message_store.finish_job(job_id)
+            continue
+        await submit_job(job_id, kind, messages, pair_config, user_id, pair_name)
+        replayed += 1
+    logger.info("Replaying %d unfinished jobs from the journal (%d dropped).", replayed, len(jobs) - replayed)
+
+async def skip_paused_messages(user_id, pair_name, pair_config):
+    """Move a resumed pair's checkpoint past what was posted while it was paused, so it is not backfilled."""
+    try:
+        latest = await client.get_messages(pair_config['source'], limit=1)
+    except Exception as e:
+        logger.error("Error fetching the latest message of %s: %s", pair_config['source'], e)
+        latest = None
+    if latest:
+        message_store.set_checkpoint(user_id, pair_name, latest[0].id)
+    else:
+        message_store.reset_checkpoint(user_id, pair_name)
+
+async def backfill_all():
+    """Backfill every active pair from its checkpoint."""
+    pairs = [route for routes in source_routes.values() for route in routes]
+    queued = await backfiller.backfill_pairs(pairs)
+    if queued:
+        logger.info("Backfill queued %d missed messages.", queued)
+
+async def watch_connection():
+    """Track the connection and backfill the gap after each reconnect."""
+    global is_connected
+    while True:
+        await asyncio.sleep(CONNECTION_CHECK_INTERVAL)
+        connected = client.is_connected()
+        if connected and not is_connected:
+            logger.info("Reconnected, backfilling missed messages.")
+            asyncio.create_task(backfill_all())
+        is_connected = connected
+
+def split_message(text, limit=4000):
+    """Split text on line boundaries into chunks under Telegram's message length limit."""
+    chunks, chunk = [], ""
+    for line in text.split("\n"):
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            chunks.append(chunk)
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+async def reply_long(event, text, limit=4000):
+    """Reply with text split on line boundaries to stay under Telegram's message length limit."""
+    for chunk in split_message(text, limit):
+        await event.reply(chunk)
+
 # Event Handlers
 @client.on(events.NewMessage)
 async def handle_new_message(event):
-    if not is_connected or not channel_mappings:
+    if not is_connected:
         return
-    source_chat_id = event.chat_id
-    if not source_chat_id:
+    routes = source_routes.get(event.chat_id)
+    if not routes:
         return
-    source_chat_id = str(source_chat_id)
-    msg_text = event.text or event.message or ""
-    for user_id, pairs in channel_mappings.items():
-        for pair_name, pair_config in pairs.items():
-            if pair_config.get('paused', False):
-                continue
-            if str(pair_config['source']) == source_chat_id:
-                await copy_message(event, pair_config['destination'], pair_config, user_id, pair_name)
+    if ALBUM_MODE and event.grouped_id and not isinstance(event, events.MessageEdited.Event):
+        return  # new album items are copied together by handle_album
+    received_at = mark_received(event)
+    kind = 'edit' if isinstance(event, events.MessageEdited.Event) else 'new'
+    await submit_journaled(kind, event.chat_id, [event], routes)
+    metrics.observe('route', time.perf_counter() - received_at)
 
 @client.on(events.MessageEdited)
 async def handle_edited_message(event):
-    await handle_new_message(event)
+    """Forward only the last of a burst of edits to one message.
+
+    The first edit waits until the message has been quiet for EDIT_DEBOUNCE
+    seconds (at most EDIT_DEBOUNCE_MAX); later edits just replace the version
+    it will forward and are counted as suppressed.
+    """
+    if not is_connected:
+        return
+    routes = source_routes.get(event.chat_id)
+    if not routes:
+        return
+    if EDIT_DEBOUNCE <= 0:
+        await handle_new_message(event)
+        return
+    key = (event.chat_id, event.id)
+    if key in pending_edits:
+        pending_edits[key] = event
+        for user_id, pair_name, _ in routes:
+            record_suppressed_edit(user_id, pair_name)
+        return
+    pending_edits[key] = event
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + EDIT_DEBOUNCE_MAX
+    try:
+        while True:
+            latest = pending_edits[key]
+            await asyncio.sleep(max(0, min(EDIT_DEBOUNCE, deadline - loop.time())))
+            if pending_edits[key] is latest or loop.time() >= deadline:
+                break
+    finally:
+        event = pending_edits.pop(key)
+    if event is not None:
+        await handle_new_message(event)
+
+@client.on(events.MessageDeleted)
+async def handle_deleted_message(event):
+    """Delete the destination copies of deleted source messages."""
+    if not is_connected:
+        return
+    if event.chat_id is not None:
+        routes = source_routes.get(event.chat_id, [])
+        for msg_id in event.deleted_ids:
+            if (event.chat_id, msg_id) in pending_edits:
+                pending_edits[(event.chat_id, msg_id)] = None  # drop the debounced edit
+    else:
+        # Deletions outside channels do not name the chat, but message ids there are unique per account.
+        routes = [route for source, source_pairs in source_routes.items()
+                  if resolve_id(source)[1] is not PeerChannel for route in source_pairs]
+        deleted = set(event.deleted_ids)
+        for key in pending_edits:
+            if key[1] in deleted and resolve_id(key[0])[1] is not PeerChannel:
+                pending_edits[key] = None
+    # Only the session that posted a copy can delete it, so ids are grouped per destination and sender.
+    by_dest = {}  # {(dest_channel, sender): [(user_id, pair_name, {source_msg_id: dest_msg_id})]}
+    for user_id, pair_name, pair_config in list(routes):
+        dest_channel = pair_config['destination']
+        for source_msg_id, (dest_msg_id, sender) in message_store.get_many(user_id, pair_name, event.deleted_ids).items():
+            deletions = by_dest.setdefault((dest_channel, sender or session_pool.home(dest_channel)), [])
+            if not deletions or deletions[-1][:2] != (user_id, pair_name):
+                deletions.append((user_id, pair_name, {}))
+            deletions[-1][2][source_msg_id] = dest_msg_id
+    for (dest_channel, sender), deletions in by_dest.items():
+        await dispatcher.submit(dest_channel, delete_copies, dest_channel, sender, deletions)
+
+async def delete_copies(dest_channel, sender, deletions):
+    """Delete mirrored messages posted by one sender, DELETE_BATCH_SIZE ids per request, then forget their mappings."""
+    try:
+        dest_ids = sorted({dest_msg_id for _, _, mapped in deletions for dest_msg_id in mapped.values()})
+        _, pair_name, mapped = deletions[0]
+        for start in range(0, len(dest_ids), DELETE_BATCH_SIZE):
+            chunk = dest_ids[start:start + DELETE_BATCH_SIZE]
+
+            async def request(client_for_send, _):
+                with metrics.timer('send'):
+                    await client_for_send.delete_messages(dest_channel, chunk)
+
+            if not await call_with_retries(dest_channel, pair_name, min(mapped), request, sender):
+                return
+        for user_id, pair_name, mapped in deletions:
+            message_store.delete_many(user_id, pair_name, mapped)
+            pair_stats[user_id][pair_name]['deleted'] += len(mapped)
+            metrics.inc('messages', len(mapped), pair=pair_name, kind='deleted')
+        logger.log(MESSAGE_LOG_LEVEL, "Deleted %d messages in %s", len(dest_ids), dest_channel)
+    except Exception as e:
+        logger.error("Error in delete_copies: %s", e)
+
+@client.on(events.Album)
+async def handle_album(event):
+    if not is_connected or not ALBUM_MODE:
+        return
+    routes = source_routes.get(event.chat_id)
+    if not routes:
+        return
+    received_at = mark_received(*event.messages)
+    await submit_journaled('album', event.chat_id, event.messages, routes)
+    metrics.observe('route', time.perf_counter() - received_at)
 
 # Admin Commands
 @client.on(events.NewMessage(pattern=r'/setpair (\S+) (-?\d+) (-?\d+)'))
@@ -161,12 +739,21 @@ async def set_pair(event):
         'header_patterns': [],
         'footer_patterns': [],
         'remove_phrases': [],
-        'remove_mentions': False
+        'remove_mentions': False,
+        'watermark_text': None,
+        'reencode_images': False,
+        'dedup_images': False
     }
+    add_route(user_id, pair_name, channel_mappings[user_id][pair_name])
+    refresh_cleaner(user_id, pair_name)
     save_mappings()
     if user_id not in pair_stats:
         pair_stats[user_id] = {}
-    pair_stats[user_id][pair_name] = {'copied': 0, 'edited': 0, 'last_activity': None}
+    pair_stats[user_id][pair_name] = new_pair_stats()
+    inactivity.remove((user_id, pair_name))
+    # An earlier pair of the same name may have had other channels
+    message_store.reset_checkpoint(user_id, pair_name)
+    message_store.drop_pair(user_id, pair_name)
     await event.reply(f"Pair '{pair_name}' set: {source} -> {dest}")
 
 @client.on(events.NewMessage(pattern=r'/pauseall'))
@@ -178,6 +765,9 @@ async def pause_all(event):
     if user_id in channel_mappings:
         for pair_config in channel_mappings[user_id].values():
             pair_config['paused'] = True
+        for pair_name in channel_mappings[user_id]:
+            remove_route(user_id, pair_name)
+            inactivity.remove((user_id, pair_name))
         save_mappings()
         await event.reply("All pairs paused.")
     else:
@@ -190,8 +780,11 @@ async def resume_all(event):
         return
     user_id = str(event.sender_id)
     if user_id in channel_mappings:
-        for pair_config in channel_mappings[user_id].values():
+        for pair_name, pair_config in channel_mappings[user_id].items():
+            if pair_config['paused']:
+                await skip_paused_messages(user_id, pair_name, pair_config)
             pair_config['paused'] = False
+            add_route(user_id, pair_name, pair_config)
         save_mappings()
         await event.reply("All pairs resumed.")
     else:
@@ -213,6 +806,66 @@ async def toggle_image_cleaning(event):
     else:
         await event.reply("Pair not found.")
 
+@client.on(events.NewMessage(pattern=r'/setwatermark (\S+) (.+)'))
+async def set_watermark(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    user_id = str(event.sender_id)
+    pair_name, text = event.pattern_match.group(1), event.pattern_match.group(2)
+    if user_id not in channel_mappings or pair_name not in channel_mappings[user_id]:
+        await event.reply("Pair not found")
+        return
+    channel_mappings[user_id][pair_name]['watermark_text'] = text
+    save_mappings()
+    await event.reply(f"Watermark '{text}' set for '{pair_name}'")
+
+@client.on(events.NewMessage(pattern=r'/clearwatermark (\S+)'))
+async def clear_watermark(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    user_id = str(event.sender_id)
+    pair_name = event.pattern_match.group(1)
+    if user_id not in channel_mappings or pair_name not in channel_mappings[user_id]:
+        await event.reply("Pair not found")
+        return
+    channel_mappings[user_id][pair_name]['watermark_text'] = None
+    save_mappings()
+    await event.reply(f"Watermark cleared for '{pair_name}'")
+
+@client.on(events.NewMessage(pattern=r'/togglereencode (\S+)'))
+async def toggle_reencode(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    user_id = str(event.sender_id)
+    pair_name = event.pattern_match.group(1)
+    if user_id not in channel_mappings or pair_name not in channel_mappings[user_id]:
+        await event.reply("Pair not found")
+        return
+    pair_config = channel_mappings[user_id][pair_name]
+    pair_config['reencode_images'] = not pair_config.get('reencode_images', False)
+    save_mappings()
+    state = "enabled" if pair_config['reencode_images'] else "disabled"
+    await event.reply(f"Image re-encoding {state} for '{pair_name}'")
+
+@client.on(events.NewMessage(pattern=r'/toggleimagededup (\S+)'))
+async def toggle_image_dedup(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    user_id = str(event.sender_id)
+    pair_name = event.pattern_match.group(1)
+    if user_id not in channel_mappings or pair_name not in channel_mappings[user_id]:
+        await event.reply("Pair not found")
+        return
+    pair_config = channel_mappings[user_id][pair_name]
+    pair_config['dedup_images'] = not pair_config.get('dedup_images', False)
+    save_mappings()
+    state = "enabled" if pair_config['dedup_images'] else "disabled"
+    await event.reply(f"Duplicate image suppression {state} for '{pair_name}'")
+
 # New Admin Commands for Filter Configuration
 @client.on(events.NewMessage(pattern=r'/addheader (\S+) (.+)'))
 async def add_header(event):
@@ -229,6 +882,7 @@ async def add_header(event):
         pair_config['header_patterns'] = []
     if pattern not in pair_config['header_patterns']:
         pair_config['header_patterns'].append(pattern)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Header pattern '{pattern}' added to '{pair_name}'")
     else:
@@ -249,6 +903,7 @@ async def add_footer(event):
         pair_config['footer_patterns'] = []
     if pattern not in pair_config['footer_patterns']:
         pair_config['footer_patterns'].append(pattern)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Footer pattern '{pattern}' added to '{pair_name}'")
     else:
@@ -269,6 +924,7 @@ async def add_remove_word(event):
         pair_config['remove_phrases'] = []
     if phrase not in pair_config['remove_phrases']:
         pair_config['remove_phrases'].append(phrase)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Remove phrase '{phrase}' added to '{pair_name}'")
     else:
@@ -287,6 +943,7 @@ async def remove_header(event):
     pair_config = channel_mappings[user_id][pair_name]
     if 'header_patterns' in pair_config and pattern in pair_config['header_patterns']:
         pair_config['header_patterns'].remove(pattern)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Header pattern '{pattern}' removed from '{pair_name}'")
     else:
@@ -305,6 +962,7 @@ async def remove_footer(event):
     pair_config = channel_mappings[user_id][pair_name]
     if 'footer_patterns' in pair_config and pattern in pair_config['footer_patterns']:
         pair_config['footer_patterns'].remove(pattern)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Footer pattern '{pattern}' removed from '{pair_name}'")
     else:
@@ -323,6 +981,7 @@ async def remove_word(event):
     pair_config = channel_mappings[user_id][pair_name]
     if 'remove_phrases' in pair_config and phrase in pair_config['remove_phrases']:
         pair_config['remove_phrases'].remove(phrase)
+        refresh_cleaner(user_id, pair_name)
         save_mappings()
         await event.reply(f"Remove phrase '{phrase}' removed from '{pair_name}'")
     else:
@@ -340,6 +999,7 @@ async def enable_mention_removal(event):
         return
     pair_config = channel_mappings[user_id][pair_name]
     pair_config['remove_mentions'] = True
+    refresh_cleaner(user_id, pair_name)
     save_mappings()
     await event.reply(f"Mention removal enabled for '{pair_name}'")
 
@@ -355,6 +1015,7 @@ async def disable_mention_removal(event):
         return
     pair_config = channel_mappings[user_id][pair_name]
     pair_config['remove_mentions'] = False
+    refresh_cleaner(user_id, pair_name)
     save_mappings()
     await event.reply(f"Mention removal disabled for '{pair_name}'")
 
@@ -378,37 +1039,150 @@ async def show_filters(event):
         f"Header patterns:\n- " + ("\n- ".join(header_patterns) if header_patterns else "None") + "\n\n"
         f"Footer patterns:\n- " + ("\n- ".join(footer_patterns) if footer_patterns else "None") + "\n\n"
         f"Remove phrases:\n- " + ("\n- ".join(remove_phrases) if remove_phrases else "None") + "\n\n"
-        f"Mention removal: {'true' if remove_mentions else 'false'}"
+        f"Mention removal: {'true' if remove_mentions else 'false'}\n"
+        f"Watermark: {pair_config.get('watermark_text') or 'None'}\n"
+        f"Image re-encoding: {'true' if pair_config.get('reencode_images') else 'false'}\n"
+        f"Duplicate image suppression: {'true' if pair_config.get('dedup_images') else 'false'}"
     )
     await event.reply(filters_str)
 
+@client.on(events.NewMessage(pattern=r'/backfill (\S+) (\d+)'))
+async def backfill_command(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    user_id = str(event.sender_id)
+    pair_name, count = event.pattern_match.group(1), int(event.pattern_match.group(2))
+    if user_id not in channel_mappings or pair_name not in channel_mappings[user_id]:
+        await event.reply("Pair not found")
+        return
+    pair_config = channel_mappings[user_id][pair_name]
+    limit = backfiller.effective_limit(count)
+    if limit < count:
+        await event.reply(f"Backfilling the last {limit} messages for '{pair_name}' "
+                          f"(capped by BACKFILL_MAX_MESSAGES={BACKFILL_MAX_MESSAGES})...")
+    else:
+        await event.reply(f"Backfilling the last {limit} messages for '{pair_name}'...")
+    queued = await backfiller.backfill_pair(user_id, pair_name, pair_config, limit=count)
+    await event.reply(f"Backfill for '{pair_name}' queued {queued} messages.")
+
+@client.on(events.NewMessage(pattern=r'/stats'))
+async def show_stats(event):
+    if event.sender_id != OWNER_ID:
+        await event.reply("Unauthorized")
+        return
+    depths = dispatcher.depths()
+    uptime = max(1.0, time.time() - metrics.started)
+    lines = [f"Uptime: {uptime / 3600:.1f}h", "", "Latency p50 / p99 (count):"]
+    for stage in ('receive', 'route', 'queue', 'clean', 'send', 'map_record', 'end_to_end'):
+        histogram = metrics.histograms.get(stage)
+        if histogram:
+            lines.append(
+                f"- {stage}: {histogram.quantile(0.5) * 1000:g} / {histogram.quantile(0.99) * 1000:g} ms ({histogram.count})"
+            )
+    user_id = str(event.sender_id)
+    if pair_stats.get(user_id):
+        retries = metrics.counter_totals('retries', 'pair')
+        failures = metrics.counter_totals('failures', 'pair')
+        lines += ["", "Pairs (copied / edited / deleted, per minute, retries / failures, edits suppressed):"]
+        for pair_name, stats in pair_stats[user_id].items():
+            lines.append(
+                f"- {pair_name}: {stats['copied']} / {stats['edited']} / {stats['deleted']}, "
+                f"{(stats['copied'] + stats['edited']) * 60 / uptime:.1f}/min, "
+                f"{retries.get(pair_name, 0)} / {failures.get(pair_name, 0)}, "
+                f"{stats['edits_suppressed']}"
+            )
+    lines += [
+        "",
+        f"Global rate: {rate_limiter.global_bucket.rate:g}/s",
+        f"Flood waits: {sum(session_pool.flood_waits.values())}",
+        f"Queued jobs: {sum(depths.values())}",
+        "",
+        "Destinations:",
+    ]
+    for dest, rate in sorted(rate_limiter.rates().items(), key=lambda item: str(item[0])):
+        line = f"- {dest}: {rate:.2f}/s, queue {depths.get(dest, 0)}"
+        paused = rate_limiter.paused_for(dest)
+        if paused:
+            line += f", paused {paused:.0f}s"
+        lines.append(line)
+    if len(session_pool.clients) > 1:
+        lines += ["", "Sessions (share of calls, average in flight, flood waits):"]
+        for name, (share, busy) in session_pool.utilisation().items():
+            line = f"- {name}: {share:.0%}, {busy:.2f}, {session_pool.flood_waits[name]}"
+            paused = session_pool.paused_for(name)
+            if paused:
+                line += f", paused {paused:.0f}s"
+            lines.append(line)
+    lines += [
+        "",
+        f"Content cache: {content_cache.hits} hits / {content_cache.misses} misses",
+        f"Media cache: {media_cache.hits} hits / {media_cache.misses} misses",
+    ]
+    if pair_stats.get(user_id):
+        lines += ["", "Media (passthrough / downloaded / uploaded):"]
+        for pair_name, stats in pair_stats[user_id].items():
+            lines.append(
+                f"- {pair_name}: {stats['media_passthrough']} / "
+                f"{stats['bytes_downloaded'] / 1e6:.1f} MB / {stats['bytes_uploaded'] / 1e6:.1f} MB"
+            )
+    await reply_long(event, "\n".join(lines))
+
 # Health Monitoring
-async def check_inactivity():
-    """Monitor pair activity and notify on prolonged inactivity."""
-    while True:
-        if not channel_mappings or not is_connected:
-            await asyncio.sleep(3600)
-            continue
-        current_time = datetime.now().timestamp()
-        for user_id, pairs in channel_mappings.items():
-            for pair_name, stats in pair_stats[user_id].items():
-                last_activity = stats.get('last_activity')
-                if last_activity and (current_time - last_activity) > INACTIVITY_THRESHOLD:
-                    await client.send_message(
-                        NOTIFY_CHAT_ID,
-                        f"Pair '{pair_name}' for user {user_id} has been inactive for over 48 hours."
-                    )
-        await asyncio.sleep(3600)  # Check every hour
+async def notify_inactive(stale):
+    """Send one digest of the pairs that stopped receiving messages."""
+    lines = []
+    for (user_id, pair_name), last_activity in stale:
+        pair_config = channel_mappings.get(user_id, {}).get(pair_name)
+        if pair_config and not pair_config['paused']:
+            lines.append(f"- '{pair_name}' (user {user_id}), last active {datetime.fromtimestamp(last_activity):%Y-%m-%d %H:%M}")
+    if lines:
+        text = f"{len(lines)} pair(s) inactive for over {INACTIVITY_THRESHOLD // 3600} hours:\n" + "\n".join(lines)
+        for chunk in split_message(text):
+            await client.send_message(NOTIFY_CHAT_ID, chunk)
+
+inactivity = InactivityMonitor(INACTIVITY_THRESHOLD, notify_inactive, INACTIVITY_DIGEST_INTERVAL)
 
 async def main():
     """Start the bot and manage tasks."""
+    image_pool.configure(IMAGE_WORKERS, IMAGE_JOB_TIMEOUT)
     load_mappings()
+    unfinished_jobs = message_store.unfinished_jobs()  # read before new jobs are journaled
     global is_connected, NOTIFY_CHAT_ID
     await client.start()
-    is_connected = client.is_connected()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        # Disconnecting ends run_until_disconnected(), so the state below is flushed on the way out.
+        loop.add_signal_handler(sig, lambda: asyncio.ensure_future(client.disconnect()))
     NOTIFY_CHAT_ID = (await client.get_me()).id
-    asyncio.create_task(check_inactivity())
-    await client.run_until_disconnected()
+    if not SENDER_SESSIONS:
+        # A second connection of the same account sends, so the listener keeps Telethon's flood sleep.
+        session_pool.clients[SESSION_FILE] = TelegramClient(
+            StringSession(StringSession.save(client.session)), API_ID, API_HASH, flood_sleep_threshold=0
+        )
+    await session_pool.start()
+    dispatcher.start()
+    if any(has_image_transform(pair_config) or pair_config.get('dedup_images')
+           for pairs in channel_mappings.values() for pair_config in pairs.values()):
+        # Load the image backends now, off the event loop, instead of on the first photo.
+        asyncio.create_task(image_pool.warm_up())
+    asyncio.create_task(message_store.run())
+    if METRICS_PORT:
+        await metrics.serve(port=METRICS_PORT)
+    asyncio.create_task(inactivity.run())
+    await replay_journal(unfinished_jobs)
+    # Live routing starts only now, so replayed jobs are queued ahead of newer messages.
+    is_connected = client.is_connected()
+    asyncio.create_task(backfill_all())
+    asyncio.create_task(watch_connection())
+    try:
+        await client.run_until_disconnected()
+    finally:
+        async with mappings_lock:
+            flush_mappings()
+        message_store.close()
+        image_pool.shutdown()
+        await session_pool.stop()
 
 if __name__ == "__main__":
     client.loop.run_until_complete(main())
@@ -0,0 +1,71 @@
+import asyncio
+from collections import OrderedDict
+
+_MISSING = object()
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._data = OrderedDict()
+
+    def get(self, key, default=None):
+        """Return the value for key and mark it as recently used."""
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key, value):
+        """Insert or update key, evicting the oldest entry when full."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+class ContentCache(LRUCache):
+    """LRU cache of content derived from a source message, shared between pairs.
+
+    Asynchronous results are cached as tasks, so pairs asking for the same
+    key while it is being computed wait for the one computation.
+    """
+
+    def __init__(self, max_size=1024):
+        super().__init__(max_size)
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, key, create):
+        """Return the cached value for key, calling create() on a miss."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = create()
+        self.put(key, value)
+        return value
+
+    async def get_or_compute(self, key, compute):
+        """Return the cached result for key, awaiting compute() once on a miss."""
+        task = self.get_or_create(key, lambda: asyncio.ensure_future(compute()))
+        try:
+            return await task
+        except Exception:
+            if self.get(key) is task:
+                self.pop(key)
+            raise
@@ -0,0 +1,113 @@
+import asyncio
+import collections
+import logging
+import time
+
+logger = logging.getLogger("StealthCopierX")
+
+class Dispatcher:
+    """Run jobs on a bounded worker pool, keeping jobs for the same key (destination) in order."""
+
+    def __init__(self, workers=4, max_queue_size=100, throttle=None, metrics=None):
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.throttle = throttle  # key -> seconds the key should be left alone
+        self.metrics = metrics  # records time spent queued as the 'queue' stage
+        self._queues = {}  # {key: asyncio.Queue of (func, args, enqueued_at)}
+        self._waiters = {}  # {key: deque of futures}, submitters blocked on a full queue, oldest first
+        self._scheduled = set()  # keys waiting in _ready or held by a worker
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks = []
+
+    def start(self):
+        """Start the worker pool."""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the worker pool. Queued jobs are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, key, func, *args):
+        """Queue func(*args) behind earlier jobs for key, waiting while the key's queue is full."""
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = asyncio.Queue(self.max_queue_size)
+        waiters = self._waiters.setdefault(key, collections.deque())
+        # Queue.put() is not FIFO between blocked callers, so submitters wait their turn here.
+        if waiters or queue.full():
+            logger.debug("Queue for %s is full, applying backpressure", key)
+            if self.metrics is not None:
+                self.metrics.inc('backpressure_waits', destination=key)
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            self._wake_submitters(key, queue)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                waiters.remove(waiter)
+                self._wake_submitters(key, queue)  # hand on a slot that may have been ours
+                raise
+            waiters.remove(waiter)
+        queue.put_nowait((func, args, time.perf_counter()))
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._idle.clear()
+            self._ready.put_nowait(key)
+
+    def _wake_submitters(self, key, queue):
+        """Wake the oldest waiting submitters for key, one per free slot."""
+        free = self.max_queue_size - queue.qsize()
+        for waiter in self._waiters.get(key, ()):
+            if free <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+            free -= 1
+
+    async def join(self):
+        """Wait until every queued job has finished."""
+        await self._idle.wait()
+
+    def depth(self, key):
+        """Number of jobs waiting for key."""
+        queue = self._queues.get(key)
+        return queue.qsize() if queue else 0
+
+    def depths(self):
+        """Number of jobs waiting per key, for keys with pending work."""
+        return {key: queue.qsize() for key, queue in self._queues.items() if queue.qsize()}
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            wait = self.throttle(key) if self.throttle else 0
+            if wait > 0:
+                # Park the key instead of tying up a worker while it is paused.
+                asyncio.get_running_loop().call_later(wait, self._ready.put_nowait, key)
+                continue
+            queue = self._queues[key]
+            func, args, enqueued_at = queue.get_nowait()
+            self._wake_submitters(key, queue)
+            if self.metrics is not None:
+                self.metrics.observe('queue', time.perf_counter() - enqueued_at)
+            try:
+                await func(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Dispatch job for %s failed: %s", key, e)
+            finally:
+                # One job per turn keeps busy keys from starving the others.
+                if queue.empty():
+                    self._scheduled.discard(key)
+                    if not self._scheduled:
+                        self._idle.set()
+                else:
+                    self._ready.put_nowait(key)
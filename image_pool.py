@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import imageutils
+from phash_index import HashIndex
+
+logger = logging.getLogger("StealthCopierX")
+
+_executor = None
+_workers = 0
+job_timeout = 30  # seconds
+
+def configure(workers, timeout=30):
+    """Start a process pool for image jobs. workers=0 disables it and runs jobs inline.
+
+    Call this at startup, before other threads exist: with the fork start
+    method all worker processes are created by the first job, which is
+    submitted here.
+    """
+    global _executor, _workers, job_timeout
+    shutdown()
+    job_timeout = timeout
+    _workers = workers
+    if workers > 0:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _executor.submit(int).result()
+        logger.info("Image process pool started with %d workers.", workers)
+
+def shutdown():
+    """Stop the process pool, if running."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+async def run(func, *args):
+    """Run func(*args) in the process pool, or inline when the pool is disabled.
+
+    Arguments and results travel as pickled bytes, so the event loop only
+    waits on the result. Raises asyncio.TimeoutError after job_timeout seconds.
+    """
+    if _executor is None:
+        return func(*args)
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(loop.run_in_executor(_executor, func, *args), job_timeout)
+
+async def warm_up():
+    """Import the image backends in the pool's processes (or a thread when inline)."""
+    if _executor is None:
+        await asyncio.to_thread(imageutils.warm_up)
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(_executor, imageutils.warm_up) for _ in range(_workers)))
+
+async def reencode_image(image_bytes):
+    return await run(imageutils.reencode_image, image_bytes)
+
+async def add_visible_watermark(image_bytes, watermark_text):
+    return await run(imageutils.add_visible_watermark, image_bytes, watermark_text)
+
+async def remove_watermark_from_image(image_bytes, target_texts):
+    return await run(imageutils.remove_watermark_from_image, image_bytes, list(target_texts))
+
+async def detect_text_in_image(image_bytes, trap_texts):
+    return await run(imageutils.detect_text_in_image, image_bytes, list(trap_texts))
+
+async def phash(image_bytes):
+    return await run(imageutils.phash, image_bytes)
+
+async def is_trap_image(image_bytes, trap_hashes, max_distance=0):
+    # Only the hash is computed in the pool; the index lookup stays in this process.
+    if not isinstance(trap_hashes, HashIndex):
+        trap_hashes = HashIndex(trap_hashes)
+    return trap_hashes.contains(await phash(image_bytes), max_distance)
@@ -0,0 +1,92 @@
+"""Image helpers. Heavy dependencies (OpenCV, Tesseract, imagehash, numpy,
+torch) are imported on first use so that text-only setups never load them."""
+import io
+from functools import lru_cache
+from phash_index import HashIndex
+
+@lru_cache(maxsize=None)
+def lama_model():
+    """Return the LaMa inpainting model if a CUDA device is available, else None."""
+    import torch
+    if not torch.cuda.is_available():
+        return None
+    from lama_model import LaMaModel  # Hypothetical LaMa integration
+    return LaMaModel
+
+def warm_up():
+    """Import every image backend now rather than on the first image."""
+    import cv2, imagehash, numpy, pytesseract  # noqa: F401
+    from PIL import Image, ImageDraw, ImageFont  # noqa: F401
+    lama_model()
+
+def remove_watermark_from_image(image_bytes, target_texts):
+    """Remove specified watermark texts from an image using OCR and inpainting."""
+    import cv2
+    import numpy as np
+    import pytesseract
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    img_array = np.array(image)
+    ocr_data = pytesseract.image_to_data(img_array, output_type=pytesseract.Output.DICT)
+    lama = lama_model()
+
+    for i, text in enumerate(ocr_data["text"]):
+        if text.strip().lower() in [t.lower() for t in target_texts]:
+            x, y, w, h = ocr_data["left"][i], ocr_data["top"][i], ocr_data["width"][i], ocr_data["height"][i]
+            x, y = max(0, x-10), max(0, y-10)
+            w, h = w+20, h+20
+            mask = np.zeros(img_array.shape[:2], dtype=np.uint8)
+            mask[y:y+h, x:x+w] = 255
+            if lama is not None:
+                img_array = lama.inpaint(img_array, mask)
+            else:
+                img_array = cv2.inpaint(img_array, mask, 3, cv2.INPAINT_TELEA)
+
+    result_image = Image.fromarray(img_array)
+    output = io.BytesIO()
+    result_image.save(output, format="PNG")
+    return output.getvalue()
+
+def detect_text_in_image(image_bytes, trap_texts):
+    """Detect trap texts in an image using OCR."""
+    import pytesseract
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
+    text = pytesseract.image_to_string(image).lower()
+    return any(trap.lower() in text for trap in trap_texts)
+
+def reencode_image(image_bytes):
+    """Re-encode image to remove metadata."""
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes))
+    output = io.BytesIO()
+    image.save(output, format='JPEG')
+    return output.getvalue()
+
+def phash(image_bytes):
+    """64-bit perceptual hash of an image as an int."""
+    import imagehash
+    from PIL import Image
+    image = Image.open(io.BytesIO(image_bytes))
+    return int(str(imagehash.phash(image)), 16)
+
+@lru_cache(maxsize=32)
+def _trap_index(trap_hashes):
+    return HashIndex(trap_hashes)
+
+def is_trap_image(image_bytes, trap_hashes, max_distance=0):
+    """Check if image is within max_distance bits of a trap hash (a HashIndex or hex strings)."""
+    if not isinstance(trap_hashes, HashIndex):
+        trap_hashes = _trap_index(tuple(trap_hashes))
+    return trap_hashes.contains(phash(image_bytes), max_distance)
+
+def add_visible_watermark(image_bytes, watermark_text):
+    """Add visible watermark to image."""
+    from PIL import Image, ImageDraw, ImageFont
+    image = Image.open(io.BytesIO(image_bytes))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default()
+    draw.text((10, 10), watermark_text, font=font, fill=(255, 255, 255, 128))
+    output = io.BytesIO()
+    image.save(output, format='JPEG')
+    return output.getvalue()
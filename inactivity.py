@@ -0,0 +1,79 @@
+import asyncio
+import heapq
+import logging
+import time
+
+logger = logging.getLogger("StealthCopierX")
+
+class InactivityMonitor:
+    """Report pairs that have been quiet for longer than `threshold` seconds.
+
+    Each tracked pair has an inactive-at deadline in a min-heap, and run()
+    sleeps until the earliest one. Activity only moves a pair's deadline in
+    a dict; its heap entry is rescheduled when it comes due, so the heap
+    holds about one entry per pair. A pair that went quiet is reported once
+    and is tracked again only after new activity. Stale pairs are sent to
+    `notify` as one list, at most once per `interval`.
+    """
+
+    def __init__(self, threshold, notify, interval=3600):
+        self.threshold = threshold
+        self.notify = notify  # async notify([(key, last_activity), ...])
+        self.interval = interval
+        self._heap = []  # (deadline, key), possibly earlier than the key's current deadline
+        self._deadlines = {}  # {key: inactive-at time} for pairs being tracked
+        self._due = {}  # {key: last_activity} for quiet pairs not yet reported
+        self._last_digest = float('-inf')
+        self._wakeup = asyncio.Event()
+
+    def activity(self, key, when=None):
+        """Record activity for key at `when` (default now)."""
+        deadline = (time.time() if when is None else when) + self.threshold
+        self._due.pop(key, None)
+        if key in self._deadlines:
+            self._deadlines[key] = max(self._deadlines[key], deadline)
+        else:
+            self._deadlines[key] = deadline
+            heapq.heappush(self._heap, (deadline, key))
+            self._wakeup.set()
+
+    def remove(self, key):
+        """Stop tracking key."""
+        self._deadlines.pop(key, None)
+        self._due.pop(key, None)
+
+    def _pop_expired(self, now):
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            current = self._deadlines.get(key)
+            if current is None:
+                continue  # removed, or already handled by a duplicate entry
+            if current > deadline:
+                heapq.heappush(self._heap, (current, key))
+            else:
+                del self._deadlines[key]
+                self._due[key] = deadline - self.threshold
+
+    async def run(self):
+        while True:
+            now = time.time()
+            self._pop_expired(now)
+            if self._due and now >= self._last_digest + self.interval:
+                self._last_digest = now
+                stale = sorted(self._due.items(), key=lambda item: item[1])
+                try:
+                    await self.notify(stale)
+                except Exception as e:
+                    logger.error("Error sending inactivity digest: %s", e)
+                else:
+                    for key, _ in stale:
+                        self._due.pop(key, None)
+                continue
+            wake = [self._heap[0][0]] if self._heap else []
+            if self._due:
+                wake.append(self._last_digest + self.interval)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(0, min(wake) - time.time()) if wake else None)
+            except asyncio.TimeoutError:
+                pass
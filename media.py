@@ -0,0 +1,34 @@
+import asyncio
+import io
+from cache import LRUCache
+
+class MediaBuffer:
+    """Download each source file at most once and share the bytes between pairs."""
+
+    def __init__(self, max_items=32):
+        self._downloads = LRUCache(max_items)  # {(chat_id, msg_id, media_id): asyncio.Task}
+
+    async def get(self, client, source_msg):
+        """Return (data, downloaded), where downloaded is True only for the caller that fetched it."""
+        key = (source_msg.chat_id, source_msg.id, media_id(source_msg.media))
+        task = self._downloads.get(key)
+        downloaded = task is None
+        if downloaded:
+            task = asyncio.ensure_future(client.download_media(source_msg, file=bytes))
+            self._downloads.put(key, task)
+        try:
+            return await task, downloaded
+        except Exception:
+            self._downloads.pop(key)
+            raise
+
+def media_id(media):
+    """Stable id of the photo or document inside a message's media, if any."""
+    item = getattr(media, 'photo', None) or getattr(media, 'document', None)
+    return getattr(item, 'id', None)
+
+def as_upload(data, name="photo.jpg"):
+    """Wrap bytes in a named file object so Telethon uploads them as a photo."""
+    file = io.BytesIO(data)
+    file.name = name
+    return file
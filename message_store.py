@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from cache import LRUCache
+
+logger = logging.getLogger("StealthCopierX")
+
+_MISSING = object()
+
+class MessageStore:
+    """Persistent (user, pair, source message) -> destination message id map.
+
+    Writes are buffered and committed in batches to a SQLite database in WAL
+    mode; reads go through a small LRU cache. Entries older than the retention
+    window are pruned periodically.
+
+    Each mapping also remembers a digest of the text last sent, so edits that
+    do not change the cleaned text can be skipped, and the name of the sender
+    session that posted the copy, which is the one able to edit or delete it.
+
+    Also keeps a checkpoint per pair: the newest source message id processed,
+    used to find gaps after downtime, and a journal of outbound copy jobs.
+    Jobs are committed before they are queued and removed in the same
+    transaction as the mappings they produced, so jobs interrupted by a
+    crash can be replayed without copying a message twice.
+    """
+
+    def __init__(self, path, retention=30 * 86400, cache_size=10000, batch_size=500):
+        self.path = path
+        self.retention = retention
+        self.batch_size = batch_size
+        self._cache = LRUCache(cache_size)
+        self._pending = {}  # {key: (dest_msg_id, digest, sender) or None for deletions}
+        self._flushing = {}  # batch currently being written by flush()
+        self._dropped = set()  # {(user_id, pair_name)} whose stored mappings are deleted with the next batch
+        self._flushing_dropped = set()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS message_map ("
+            "user_id TEXT NOT NULL, pair_name TEXT NOT NULL, source_msg_id INTEGER NOT NULL, "
+            "dest_msg_id INTEGER NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (user_id, pair_name, source_msg_id)) WITHOUT ROWID"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(message_map)")}
+        if 'digest' not in columns:
+            self._conn.execute("ALTER TABLE message_map ADD COLUMN digest BLOB")
+        if 'sender' not in columns:
+            self._conn.execute("ALTER TABLE message_map ADD COLUMN sender TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS message_map_created_at ON message_map (created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "user_id TEXT NOT NULL, pair_name TEXT NOT NULL, last_msg_id INTEGER NOT NULL, "
+            "PRIMARY KEY (user_id, pair_name)) WITHOUT ROWID"
+        )
+        self._checkpoints = {
+            (user_id, pair_name): last_msg_id
+            for user_id, pair_name, last_msg_id in self._conn.execute("SELECT * FROM checkpoints")
+        }
+        self._dirty_checkpoints = set()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "job_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, pair_name TEXT NOT NULL, "
+            "chat_id INTEGER NOT NULL, msg_ids TEXT NOT NULL, kind TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._finished_jobs = set()
+
+    def get(self, user_id, pair_name, source_msg_id):
+        """Return the destination message id, or None if the message is not mapped."""
+        entry = self._lookup((user_id, pair_name, source_msg_id))
+        return entry[0] if entry else None
+
+    def get_digest(self, user_id, pair_name, source_msg_id):
+        """Return the digest of the text last sent for a message, or None."""
+        entry = self._lookup((user_id, pair_name, source_msg_id))
+        return entry[1] if entry else None
+
+    def _lookup(self, key):
+        # Each batch only holds changes made after the drops it is written with.
+        for batch, dropped in ((self._pending, self._dropped), (self._flushing, self._flushing_dropped)):
+            if key in batch:
+                return batch[key]
+            if key[:2] in dropped:
+                return None
+        entry = self._cache.get(key, _MISSING)
+        if entry is _MISSING:
+            with self._lock:
+                entry = self._conn.execute(
+                    "SELECT dest_msg_id, digest, sender FROM message_map "
+                    "WHERE user_id = ? AND pair_name = ? AND source_msg_id = ?",
+                    key
+                ).fetchone()
+            self._cache.put(key, entry)
+        return entry
+
+    def get_sender(self, user_id, pair_name, source_msg_id):
+        """Return the name of the sender session that posted the copy, or None."""
+        entry = self._lookup((user_id, pair_name, source_msg_id))
+        return entry[2] if entry else None
+
+    def get_many(self, user_id, pair_name, source_msg_ids):
+        """Return {source_msg_id: (dest_msg_id, sender)} for the mapped ones among source_msg_ids."""
+        mapped = {}
+        for source_msg_id in source_msg_ids:
+            entry = self._lookup((user_id, pair_name, source_msg_id))
+            if entry:
+                mapped[source_msg_id] = (entry[0], entry[2])
+        return mapped
+
+    def put(self, user_id, pair_name, source_msg_id, dest_msg_id, digest=None, sender=None):
+        """Record a mapping. It is written to disk with the next batch."""
+        self._set((user_id, pair_name, source_msg_id), (dest_msg_id, digest, sender))
+
+    def put_many(self, user_id, pair_name, pairs, sender=None):
+        """Record several (source_msg_id, dest_msg_id) mappings for one pair."""
+        for source_msg_id, dest_msg_id in pairs:
+            self._set((user_id, pair_name, source_msg_id), (dest_msg_id, None, sender))
+
+    def set_digest(self, user_id, pair_name, source_msg_id, digest):
+        """Update the sent-text digest of an existing mapping."""
+        key = (user_id, pair_name, source_msg_id)
+        entry = self._lookup(key)
+        if entry:
+            self._set(key, (entry[0], digest, entry[2]))
+
+    def delete(self, user_id, pair_name, source_msg_id):
+        """Forget a mapping."""
+        self._set((user_id, pair_name, source_msg_id), None)
+
+    def delete_many(self, user_id, pair_name, source_msg_ids):
+        """Forget several mappings of one pair."""
+        for source_msg_id in source_msg_ids:
+            self._set((user_id, pair_name, source_msg_id), None)
+
+    def drop_pair(self, user_id, pair_name):
+        """Forget every mapping of a pair, with its digests and senders.
+
+        The stored rows are deleted with the next batch, before the mappings
+        recorded after this call.
+        """
+        for key in [key for key in self._pending if key[:2] == (user_id, pair_name)]:
+            del self._pending[key]
+        self._dropped.add((user_id, pair_name))
+        self._cache.clear()
+
+    def get_checkpoint(self, user_id, pair_name):
+        """Newest source message id processed for a pair, or None."""
+        return self._checkpoints.get((user_id, pair_name))
+
+    def set_checkpoint(self, user_id, pair_name, msg_id):
+        """Advance a pair's checkpoint to msg_id (never moves backwards)."""
+        key = (user_id, pair_name)
+        if msg_id > self._checkpoints.get(key, 0):
+            self._checkpoints[key] = msg_id
+            self._dirty_checkpoints.add(key)
+
+    def reset_checkpoint(self, user_id, pair_name, msg_id=None):
+        """Set a pair's checkpoint even if it moves backwards, or clear it with None."""
+        key = (user_id, pair_name)
+        if msg_id is None:
+            self._checkpoints.pop(key, None)
+        else:
+            self._checkpoints[key] = msg_id
+        self._dirty_checkpoints.add(key)
+
+    def add_jobs(self, jobs):
+        """Journal (user_id, pair_name, chat_id, msg_ids, kind) copy jobs and return their ids.
+
+        Unlike mappings, jobs are committed immediately, in one transaction.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                job_ids = [
+                    self._conn.execute(
+                        "INSERT INTO journal (user_id, pair_name, chat_id, msg_ids, kind, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (user_id, pair_name, chat_id, " ".join(map(str, msg_ids)), kind, now)
+                    ).lastrowid
+                    for user_id, pair_name, chat_id, msg_ids, kind in jobs
+                ]
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+        return job_ids
+
+    def finish_job(self, job_id):
+        """Mark a journaled job as finished. It is removed with the next batch."""
+        self._finished_jobs.add(job_id)
+
+    def unfinished_jobs(self):
+        """Unfinished journaled jobs, oldest first: (job_id, user_id, pair_name, chat_id, msg_ids, kind)."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, user_id, pair_name, chat_id, msg_ids, kind FROM journal ORDER BY job_id"
+            ).fetchall()
+        return [
+            (job_id, user_id, pair_name, chat_id, [int(i) for i in msg_ids.split()], kind)
+            for job_id, user_id, pair_name, chat_id, msg_ids, kind in rows
+            if job_id not in self._finished_jobs
+        ]
+
+    def _set(self, key, entry):
+        self._pending[key] = entry
+        self._cache.put(key, entry)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered changes to disk."""
+        batch = self._take()
+        try:
+            self._write(batch)
+        except Exception as e:
+            self._restore(batch, e)
+        finally:
+            self._flushing = {}
+            self._flushing_dropped = set()
+
+    async def flush_async(self):
+        """Write buffered changes to disk from a worker thread."""
+        batch = self._take()
+        try:
+            await asyncio.to_thread(self._write, batch)
+        except Exception as e:
+            self._restore(batch, e)
+        finally:
+            self._flushing = {}
+            self._flushing_dropped = set()
+
+    def _take(self):
+        self._flushing, self._pending = self._pending, {}
+        checkpoints = [key + (self._checkpoints.get(key),) for key in self._dirty_checkpoints]
+        self._dirty_checkpoints = set()
+        jobs, self._finished_jobs = self._finished_jobs, set()
+        self._flushing_dropped, self._dropped = self._dropped, set()
+        return self._flushing, checkpoints, jobs, self._flushing_dropped
+
+    def _restore(self, batch, error):
+        logger.error("Error writing message map: %s", error)
+        # Keep the batch for the next attempt, without overwriting newer changes.
+        mappings, checkpoints, jobs, dropped = batch
+        self._pending = {**mappings, **self._pending}
+        self._dropped.update(dropped)
+        self._dirty_checkpoints.update((user_id, pair_name) for user_id, pair_name, _ in checkpoints)
+        self._finished_jobs.update(jobs)
+
+    def _write(self, batch):
+        batch, checkpoints, jobs, dropped = batch
+        if not batch and not checkpoints and not jobs and not dropped:
+            return
+        now = time.time()
+        upserts = [key + (entry[0], now) + entry[1:] for key, entry in batch.items() if entry is not None]
+        deletes = [key for key, entry in batch.items() if entry is None]
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("DELETE FROM message_map WHERE user_id = ? AND pair_name = ?", dropped)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO message_map "
+                    "(user_id, pair_name, source_msg_id, dest_msg_id, created_at, digest, sender) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    upserts
+                )
+                self._conn.executemany(
+                    "DELETE FROM message_map WHERE user_id = ? AND pair_name = ? AND source_msg_id = ?",
+                    deletes
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                    [checkpoint for checkpoint in checkpoints if checkpoint[2] is not None]
+                )
+                self._conn.executemany(
+                    "DELETE FROM checkpoints WHERE user_id = ? AND pair_name = ?",
+                    [checkpoint[:2] for checkpoint in checkpoints if checkpoint[2] is None]
+                )
+                self._conn.executemany("DELETE FROM journal WHERE job_id = ?", [(job_id,) for job_id in jobs])
+                self._conn.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def prune(self):
+        """Delete mappings older than the retention window and return how many were removed."""
+        cutoff = time.time() - self.retention
+        with self._lock:
+            return self._conn.execute("DELETE FROM message_map WHERE created_at < ?", (cutoff,)).rowcount
+
+    def compact(self):
+        """Copy the write-ahead log back into the database and truncate it."""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    async def run(self, flush_interval=1, prune_interval=3600):
+        """Flush batches and prune old entries in the background."""
+        last_prune = None
+        while True:
+            await asyncio.sleep(flush_interval)
+            await self.flush_async()
+            if last_prune is None or time.monotonic() - last_prune >= prune_interval:
+                deleted = await asyncio.to_thread(self.prune)
+                if deleted:
+                    self._cache.clear()
+                    logger.info("Pruned %d message mappings older than %ss.", deleted, self.retention)
+                await asyncio.to_thread(self.compact)
+                last_prune = time.monotonic()
+
+    def close(self):
+        """Flush pending changes and close the database."""
+        self.flush()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,128 @@
+import asyncio
+import bisect
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("StealthCopierX")
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Histogram:
+    """Fixed-bucket latency histogram (seconds)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (inf if beyond the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class Metrics:
+    """Latency histograms per pipeline stage, labelled counters and gauges."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.histograms = {}  # {stage: Histogram}
+        self.counters = {}  # {(name, labels): value}, labels a sorted tuple of (key, value)
+        self.gauges = {}  # {name: callable returning {labels: value}}
+
+    def observe(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def gauge(self, name, func):
+        """Register a gauge; func() returns {labels tuple: value}."""
+        self.gauges[name] = func
+
+    def counter_totals(self, name, label):
+        """Sum a counter by one of its labels."""
+        totals = {}
+        for (counter, labels), value in self.counters.items():
+            if counter == name:
+                key = dict(labels).get(label)
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render_prometheus(self, prefix="stealthcopierx"):
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = [f"{prefix}_uptime_seconds {time.time() - self.started:.0f}"]
+        if self.histograms:
+            name = f"{prefix}_stage_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        typed = set()
+        for (counter, labels), value in sorted(self.counters.items(), key=lambda item: str(item[0])):
+            name = f"{prefix}_{counter}_total"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for gauge, func in sorted(self.gauges.items()):
+            name = f"{prefix}_{gauge}"
+            lines.append(f"# TYPE {name} gauge")
+            for labels, value in func().items():
+                lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def serve(self, host="127.0.0.1", port=9464):
+        """Serve render_prometheus() over plain HTTP for any request path."""
+        async def handle(reader, writer):
+            try:
+                await reader.readuntil(b"\r\n\r\n")
+                body = self.render_prometheus().encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                    b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body
+                )
+                await writer.drain()
+            except Exception as e:
+                logger.debug("Metrics request failed: %s", e)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle, host, port)
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+        return server
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{str(value).replace(chr(34), chr(39))}"' for key, value in labels) + "}"
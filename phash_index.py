@@ -0,0 +1,114 @@
+from array import array
+from collections import deque
+from itertools import combinations
+
+class HashIndex:
+    """64-bit perceptual hashes with Hamming-distance lookup via multi-index hashing.
+
+    Hashes live in a compact array('Q'). Each hash is split into `chunks`
+    substrings, each indexed in its own table. Two hashes within distance k
+    must agree to within k // chunks bits on at least one substring, so a
+    query only probes that neighbourhood of each table and verifies the
+    candidates, instead of scanning every hash.
+    """
+
+    def __init__(self, hashes=(), chunks=4):
+        if 64 % chunks:
+            raise ValueError("chunks must divide 64")
+        self.chunks = chunks
+        self.chunk_bits = 64 // chunks
+        self._mask = (1 << self.chunk_bits) - 1
+        self._hashes = array('Q')
+        self._tables = [{} for _ in range(chunks)]  # {substring: [positions]}
+        self._deleted = set()
+        for h in hashes:
+            self.add(h)
+
+    def __len__(self):
+        return len(self._hashes) - len(self._deleted)
+
+    def _substrings(self, h):
+        return [(h >> (i * self.chunk_bits)) & self._mask for i in range(self.chunks)]
+
+    def add(self, h):
+        """Add a hash (int, or hex string as produced by imagehash)."""
+        h = to_int(h)
+        pos = len(self._hashes)
+        self._hashes.append(h)
+        for table, sub in zip(self._tables, self._substrings(h)):
+            table.setdefault(sub, []).append(pos)
+
+    def remove(self, h):
+        """Remove one copy of a hash, if present."""
+        h = to_int(h)
+        table = self._tables[0]
+        for pos in table.get(h & self._mask, ()):
+            if pos not in self._deleted and self._hashes[pos] == h:
+                self._deleted.add(pos)
+                break
+        if len(self._deleted) > len(self._hashes) // 2:
+            self._compact()
+
+    def _compact(self):
+        live = [h for pos, h in enumerate(self._hashes) if pos not in self._deleted]
+        self._hashes = array('Q')
+        self._tables = [{} for _ in range(self.chunks)]
+        self._deleted = set()
+        for h in live:
+            self.add(h)
+
+    def _candidates(self, h, max_distance):
+        radius = max_distance // self.chunks
+        flips = [0]
+        for r in range(1, radius + 1):
+            flips += [sum(1 << b for b in bits) for bits in combinations(range(self.chunk_bits), r)]
+        seen = set()
+        for table, sub in zip(self._tables, self._substrings(h)):
+            for flip in flips:
+                for pos in table.get(sub ^ flip, ()):
+                    if pos not in seen:
+                        seen.add(pos)
+                        yield pos
+
+    def find(self, h, max_distance=0):
+        """Return [(hash, distance)] for every stored hash within max_distance of h."""
+        h = to_int(h)
+        found = []
+        for pos in self._candidates(h, max_distance):
+            if pos in self._deleted:
+                continue
+            distance = (h ^ self._hashes[pos]).bit_count()
+            if distance <= max_distance:
+                found.append((self._hashes[pos], distance))
+        return found
+
+    def contains(self, h, max_distance=0):
+        """True if any stored hash is within max_distance of h."""
+        h = to_int(h)
+        for pos in self._candidates(h, max_distance):
+            if pos not in self._deleted and (h ^ self._hashes[pos]).bit_count() <= max_distance:
+                return True
+        return False
+
+class RecentHashes:
+    """Sliding window of the most recently forwarded image hashes for one pair."""
+
+    def __init__(self, max_items=1000, chunks=4):
+        self.max_items = max_items
+        self._order = deque()
+        self._index = HashIndex(chunks=chunks)
+
+    def seen(self, h, max_distance=0):
+        """True if a near-duplicate of h was forwarded recently."""
+        return self._index.contains(h, max_distance)
+
+    def add(self, h):
+        h = to_int(h)
+        self._order.append(h)
+        self._index.add(h)
+        if len(self._order) > self.max_items:
+            self._index.remove(self._order.popleft())
+
+def to_int(h):
+    """Convert a hex hash string (str(imagehash.phash(...))) to a 64-bit int."""
+    return int(h, 16) if isinstance(h, str) else h
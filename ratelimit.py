@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now=None):
+        """Seconds until a token is available, including any pause."""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0, self.paused_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def take(self):
+        self.tokens -= 1
+
+class RateLimiter:
+    """Per-destination token buckets behind a shared global bucket.
+
+    A flood wait pauses only the affected destination for the requested time
+    and halves its rate; each successful send then recovers the rate
+    gradually back to the configured one.
+    """
+
+    def __init__(self, rate=1, burst=3, global_rate=20, global_burst=20, min_rate=0.05, recovery=0.05):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.recovery = recovery  # fraction of `rate` regained per successful send
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.buckets = {}
+        self.flood_waits = 0
+
+    def _bucket(self, dest):
+        bucket = self.buckets.get(dest)
+        if bucket is None:
+            bucket = self.buckets[dest] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    def paused_for(self, dest):
+        """Seconds left on a flood-wait pause for dest."""
+        bucket = self.buckets.get(dest)
+        return max(0, bucket.paused_until - time.monotonic()) if bucket else 0
+
+    async def acquire(self, dest):
+        """Wait until both dest and the global budget allow one request."""
+        bucket = self._bucket(dest)
+        while True:
+            now = time.monotonic()
+            wait = max(bucket.delay(now), self.global_bucket.delay(now))
+            if wait <= 0:
+                bucket.take()
+                self.global_bucket.take()
+                return
+            await asyncio.sleep(wait)
+
+    def flood_wait(self, dest, seconds):
+        """Pause dest for the server-requested time and back off its rate."""
+        bucket = self._bucket(dest)
+        bucket.paused_until = max(bucket.paused_until, time.monotonic() + seconds)
+        bucket.rate = max(self.min_rate, bucket.rate / 2)
+        bucket.tokens = min(bucket.tokens, 0)
+        self.flood_waits += 1
+
+    def success(self, dest):
+        """Recover part of dest's rate after a successful request."""
+        bucket = self._bucket(dest)
+        if bucket.rate < self.rate:
+            bucket.rate = min(self.rate, bucket.rate + self.rate * self.recovery)
+
+    def rates(self):
+        """Current rate per destination."""
+        return {dest: bucket.rate for dest, bucket in self.buckets.items()}
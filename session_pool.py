@@ -0,0 +1,101 @@
+import bisect
+import hashlib
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("StealthCopierX")
+
+class SessionPool:
+    """Sender accounts with destinations assigned by consistent hashing.
+
+    Every destination has a home sender on a hash ring, so its messages keep
+    going out through one account in order, and adding or removing a session
+    only moves the destinations of that session. While a sender is in a flood
+    wait its destinations fail over to the next sender on the ring.
+    """
+
+    def __init__(self, senders, replicas=64):
+        self.clients = dict(senders)  # {name: TelegramClient}
+        self._ring = sorted((_hash(f"{name}#{i}"), name) for name in self.clients for i in range(replicas))
+        self._points = [point for point, _ in self._ring]
+        self.paused_until = dict.fromkeys(self.clients, 0)
+        self.calls = dict.fromkeys(self.clients, 0)
+        self.busy = dict.fromkeys(self.clients, 0.0)  # seconds spent in API calls
+        self.flood_waits = dict.fromkeys(self.clients, 0)
+        self.started = time.monotonic()
+
+    def _senders(self, dest):
+        """Sender names in ring order starting at dest's home sender."""
+        start = bisect.bisect(self._points, _hash(str(dest)))
+        seen = []
+        for i in range(len(self._ring)):
+            name = self._ring[(start + i) % len(self._ring)][1]
+            if name not in seen:
+                seen.append(name)
+                if len(seen) == len(self.clients):
+                    break
+        return seen
+
+    def home(self, dest):
+        """Name of the sender that owns dest."""
+        return self._senders(dest)[0]
+
+    def sender_for(self, dest):
+        """Name of the sender to use for dest now.
+
+        A flood-waited home sender is skipped in favour of the next available
+        one on the ring; if every sender is waiting, the one that is free
+        soonest is returned.
+        """
+        names = self._senders(dest)
+        now = time.monotonic()
+        for name in names:
+            if self.paused_until[name] <= now:
+                return name
+        return min(names, key=self.paused_until.get)
+
+    def flood_wait(self, name, seconds):
+        """Take a sender out of rotation. Returns True if another sender is available."""
+        now = time.monotonic()
+        self.paused_until[name] = max(self.paused_until[name], now + seconds)
+        self.flood_waits[name] += 1
+        return any(until <= now for until in self.paused_until.values())
+
+    def paused_for(self, name):
+        return max(0, self.paused_until[name] - time.monotonic())
+
+    @contextmanager
+    def using(self, name):
+        """Account one API call against a sender."""
+        self.calls[name] += 1
+        start = time.perf_counter()
+        try:
+            yield self.clients[name]
+        finally:
+            self.busy[name] += time.perf_counter() - start
+
+    def utilisation(self):
+        """{name: (share of all calls, average calls in flight)} per sender."""
+        total = sum(self.calls.values()) or 1
+        elapsed = max(1e-9, time.monotonic() - self.started)
+        return {name: (self.calls[name] / total, self.busy[name] / elapsed) for name in self.clients}
+
+    async def start(self):
+        """Log in every sender and load its dialogs.
+
+        Sender sessions must already be authorised and be members of their
+        destinations; loading the dialogs caches the entities they send to.
+        """
+        for name, client in self.clients.items():
+            await client.start()
+            await client.get_dialogs()
+            logger.info("Sender session '%s' ready.", name)
+
+    async def stop(self):
+        for client in self.clients.values():
+            if client is not None:
+                await client.disconnect()
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
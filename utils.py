@@ -1,18 +1,23 @@
 import re
 import unicodedata
-import cv2
-import pytesseract
-from PIL import Image, ImageDraw, ImageFont
-import io
-import imagehash
-import numpy as np
-import torch
+from functools import lru_cache
 
-# Check for LaMa availability (for advanced inpainting)
-USE_LAMA = torch.cuda.is_available()
+try:
+    import ahocorasick  # pyahocorasick
+except ImportError:
+    ahocorasick = None
 
-if USE_LAMA:
-    from lama_model import LaMaModel  # Hypothetical LaMa integration
+# Image helpers live in imageutils so their heavy dependencies load only when used.
+_IMAGE_FUNCTIONS = {
+    'remove_watermark_from_image', 'detect_text_in_image', 'reencode_image',
+    'is_trap_image', 'add_visible_watermark',
+}
+
+def __getattr__(name):
+    if name in _IMAGE_FUNCTIONS:
+        import imageutils
+        return getattr(imageutils, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def clean_text(text, config):
     """Clean the text by removing headers, footers, phrases, and mentions while preserving formatting."""
@@ -44,38 +49,178 @@ def clean_text(text, config):
     cleaned_text = '\n'.join(lines).strip()
     return cleaned_text
 
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+
+class _Automaton:
+    """Pure-Python fallback with the subset of ahocorasick.Automaton used below."""
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+    def add_word(self, word, value):
+        node = 0
+        for char in word:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append(value)
+
+    def make_automaton(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def iter(self, text):
+        node = 0
+        for end, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for value in self._out[node]:
+                yield end, value
+
+def is_literal(phrase):
+    """True if the phrase has no regex metacharacters and can be matched as plain text."""
+    return not REGEX_CHARS.intersection(phrase)
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over a set of literal phrases.
+
+    Finds every occurrence of every phrase in one linear scan of the text,
+    however many phrases there are.
+    """
+
+    def __init__(self, phrases, ignore_case=False):
+        self.ignore_case = ignore_case
+        self.phrases = sorted({p.lower() if ignore_case else p for p in phrases if p})
+        self._automaton = None
+        if self.phrases:
+            automaton = ahocorasick.Automaton() if ahocorasick is not None else _Automaton()
+            for phrase in self.phrases:
+                automaton.add_word(phrase, len(phrase))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def spans(self, text):
+        """Yield (start, end) for every occurrence, ordered by end position."""
+        if self._automaton is None:
+            return
+        if self.ignore_case:
+            text = text.lower()
+        for end, length in self._automaton.iter(text):
+            yield end - length + 1, end + 1
+
+    def contains(self, text):
+        """True if any phrase occurs in the text."""
+        return next(self.spans(text), None) is not None
+
+    def remove(self, text):
+        """Remove non-overlapping occurrences of the phrases (case-sensitive matchers only).
+
+        Matches are taken left to right, preferring the longest phrase at each
+        position, so a phrase that is a prefix of another never cuts it short.
+        """
+        spans = sorted(self.spans(text), key=lambda span: (span[0], -span[1]))
+        if not spans:
+            return text
+        pieces = []
+        pos = 0
+        for start, end in spans:
+            if start < pos:
+                continue  # overlaps a match already removed
+            pieces.append(text[pos:start])
+            pos = end
+        pieces.append(text[pos:])
+        return ''.join(pieces)
+
+MENTION_RE = re.compile(r'@[a-zA-Z0-9_]+|t\.me/\S+')
+BACKREF_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+def _compile(pattern):
+    """Compile a user-supplied pattern, treating invalid regexes as literal text."""
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return re.compile(re.escape(pattern))
+
+class TextCleaner:
+    """Precompiled form of a pair's filters, equivalent to clean_text(text, config).
+
+    Build one per pair whenever its filters change and reuse it for every message.
+    Literal remove phrases go through an Aho-Corasick matcher and regex ones are
+    merged into a single alternation, so the text is scanned once for each.
+    """
+
+    def __init__(self, config):
+        self.header_patterns = [_compile(p) for p in config.get('header_patterns', [])]
+        self.footer_patterns = [_compile(p) for p in config.get('footer_patterns', [])]
+        self.remove_mentions = config.get('remove_mentions', False)
+        remove_phrases = config.get('remove_phrases', [])
+        # Pairs with equal fingerprints clean any text identically
+        self.fingerprint = (
+            tuple(config.get('header_patterns', [])), tuple(config.get('footer_patterns', [])),
+            tuple(remove_phrases), bool(self.remove_mentions)
+        )
+        self.literal_phrases = PhraseMatcher([p for p in remove_phrases if is_literal(p)])
+        phrases = [_compile(p) for p in remove_phrases if not is_literal(p)]
+        self.phrase_patterns = phrases
+        self.phrase_re = None
+        # Backreferences would point at the wrong group once the phrases are merged
+        if phrases and not any(BACKREF_RE.search(p.pattern) for p in phrases):
+            try:
+                self.phrase_re = re.compile('|'.join(f'(?:{p.pattern})' for p in phrases))
+            except re.error:
+                # e.g. inline flags that are only valid at the start of a pattern
+                pass
+
+    def clean(self, text):
+        """Clean the text using the compiled filters."""
+        lines = text.split('\n')
+
+        for pattern in self.header_patterns:
+            if lines and pattern.match(lines[0]):
+                lines.pop(0)
+
+        for pattern in self.footer_patterns:
+            if lines and pattern.match(lines[-1]):
+                lines.pop()
+
+        if self.phrase_re is not None:
+            lines = [self.phrase_re.sub('', line) for line in lines]
+        else:
+            for pattern in self.phrase_patterns:
+                lines = [pattern.sub('', line) for line in lines]
+
+        # Literal phrases and mentions never span lines, so they can run over the whole text
+        text = self.literal_phrases.remove('\n'.join(lines))
+
+        if self.remove_mentions:
+            text = MENTION_RE.sub('', text)
+
+        return text.strip()
+
+@lru_cache(maxsize=256)
+def _trap_matcher(trap_phrases):
+    return PhraseMatcher(trap_phrases, ignore_case=True)
+
 def should_block_message(text, trap_phrases):
-    """Check if the text contains any trap phrases."""
-    return any(phrase.lower() in text.lower() for phrase in trap_phrases)
-
-def remove_watermark_from_image(image_bytes, target_texts):
-    """Remove specified watermark texts from an image using OCR and inpainting."""
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img_array = np.array(image)
-    ocr_data = pytesseract.image_to_data(img_array, output_type=pytesseract.Output.DICT)
-    
-    for i, text in enumerate(ocr_data["text"]):
-        if text.strip().lower() in [t.lower() for t in target_texts]:
-            x, y, w, h = ocr_data["left"][i], ocr_data["top"][i], ocr_data["width"][i], ocr_data["height"][i]
-            x, y = max(0, x-10), max(0, y-10)
-            w, h = w+20, h+20
-            mask = np.zeros(img_array.shape[:2], dtype=np.uint8)
-            mask[y:y+h, x:x+w] = 255
-            if USE_LAMA:
-                img_array = LaMaModel.inpaint(img_array, mask)
-            else:
-                img_array = cv2.inpaint(img_array, mask, 3, cv2.INPAINT_TELEA)
-    
-    result_image = Image.fromarray(img_array)
-    output = io.BytesIO()
-    result_image.save(output, format="PNG")
-    return output.getvalue()
-
-def detect_text_in_image(image_bytes, trap_texts):
-    """Detect trap texts in an image using OCR."""
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    text = pytesseract.image_to_string(image).lower()
-    return any(trap.lower() in text for trap in trap_texts)
+    """Check if the text contains any trap phrases (a list or a case-insensitive PhraseMatcher)."""
+    if not isinstance(trap_phrases, PhraseMatcher):
+        trap_phrases = _trap_matcher(tuple(trap_phrases))
+    return trap_phrases.contains(text)
 
 def filter_content(text, mapping):
     """Filter URLs, mentions, and custom footers from text."""
@@ -92,34 +237,11 @@ def generate_watermark(msg_id):
     binary_id = bin(msg_id)[2:]
     return ''.join(['\u200B' if bit == '0' else '\u200C' for bit in binary_id])
 
-def reencode_image(image_bytes):
-    """Re-encode image to remove metadata."""
-    image = Image.open(io.BytesIO(image_bytes))
-    output = io.BytesIO()
-    image.save(output, format='JPEG')
-    return output.getvalue()
-
-def is_trap_image(image_bytes, trap_hashes):
-    """Check if image matches a trap hash."""
-    image = Image.open(io.BytesIO(image_bytes))
-    hash = str(imagehash.phash(image))
-    return hash in trap_hashes
-
-def add_visible_watermark(image_bytes, watermark_text):
-    """Add visible watermark to image."""
-    image = Image.open(io.BytesIO(image_bytes))
-    draw = ImageDraw.Draw(image)
-    font = ImageFont.load_default()
-    draw.text((10, 10), watermark_text, font=font, fill=(255, 255, 255, 128))
-    output = io.BytesIO()
-    image.save(output, format='JPEG')
-    return output.getvalue()
-
 async def notify_trap(event, mapping, pair_name, reason):
     """Notify owner of detected trap."""
     from bot import NOTIFY_CHAT_ID, client, logger
     if NOTIFY_CHAT_ID:
-        logger.info(f"Trap detected in '{pair_name}': {reason}")
+        logger.info("Trap detected in '%s': %s", pair_name, reason)
         await client.send_message(
             NOTIFY_CHAT_ID,
             f"🚨 Trap detected in '{pair_name}': {reason}"